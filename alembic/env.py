@@ -19,7 +19,7 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.models.base import Base
-from app.models import account, store, sales
+from app.models import account, store, sales, upload, dims
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,108 @@
+"""sales_fact delta: group_key/row_hash + sales_fact_changes
+
+Revision ID: 30d1bc314720
+Revises: 1520a4b5d66e
+Create Date: 2026-10-19 14:05:31.904218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '30d1bc314720'
+down_revision: Union[str, None] = '1520a4b5d66e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# канон должен совпадать с app/services/sales_delta.py (_fmt): NULL -> '\N', numeric(18,2)::text
+# (в numeric значение уже округлено половиной от нуля -- _fmt квантует так же, ROUND_HALF_UP)
+GROUP_KEY_SQL = r"""
+md5(concat_ws('|',
+    coalesce(store_id::text, '\N'),
+    coalesce(sale_date::text, '\N'),
+    coalesce(application_id::text, '\N'),
+    coalesce(sku, '\N'),
+    coalesce(price::text, '\N'),
+    coalesce(total::text, '\N'),
+    coalesce(invoice, '\N'),
+    coalesce(return_type, '\N')
+))
+"""
+
+ROW_HASH_SQL = r"""
+md5(concat_ws('|',
+    qty::text,
+    status,
+    coalesce(product_name_snapshot, '\N'),
+    coalesce(store_name, '\N')
+))
+"""
+
+
+def upgrade() -> None:
+    op.add_column('sales_fact', sa.Column('group_key', sa.String(length=32), nullable=True))
+    op.add_column('sales_fact', sa.Column('row_hash', sa.String(length=32), nullable=True))
+
+    op.execute(f"UPDATE sales_fact SET group_key = {GROUP_KEY_SQL}")
+
+    # при store_id IS NULL uq_sales_fact_group не срабатывал -> повторные загрузки давали дубли;
+    # оставляем последнюю версию группы
+    op.execute(
+        """
+        DELETE FROM sales_fact f
+        USING sales_fact newer
+        WHERE newer.group_key = f.group_key AND newer.id > f.id
+        """
+    )
+    # sku_sales_daily наполнялся (43ff0046fc9b) в том числе из удалённых дублей -- пересобираем целиком
+    op.execute("TRUNCATE sku_sales_daily")
+    op.execute(
+        """
+        INSERT INTO sku_sales_daily (sku, store_id, sale_date, qty, canceled_qty, revenue)
+        SELECT sku, store_id, sale_date,
+               coalesce(sum(qty) FILTER (WHERE status = 'active'), 0),
+               coalesce(sum(qty) FILTER (WHERE status = 'canceled'), 0),
+               sum(total * qty) FILTER (WHERE status = 'active')
+        FROM sales_fact
+        WHERE sku IS NOT NULL
+        GROUP BY sku, store_id, sale_date
+        """
+    )
+    op.execute(f"UPDATE sales_fact SET row_hash = {ROW_HASH_SQL}")
+
+    op.alter_column('sales_fact', 'group_key', existing_type=sa.String(length=32), nullable=False)
+    op.alter_column('sales_fact', 'row_hash', existing_type=sa.String(length=32), nullable=False)
+    op.create_index('ux_sales_fact_group_key', 'sales_fact', ['group_key'], unique=True)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('sales_fact_changes',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('report_run_id', sa.Integer(), nullable=False),
+    sa.Column('group_key', sa.String(length=32), nullable=False),
+    sa.Column('change_type', sa.String(length=16), nullable=False),
+    sa.Column('old_qty', sa.Integer(), nullable=True),
+    sa.Column('new_qty', sa.Integer(), nullable=True),
+    sa.Column('old_status', sa.String(length=16), nullable=True),
+    sa.Column('new_status', sa.String(length=16), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['report_run_id'], ['report_runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sales_fact_changes_group_key', 'sales_fact_changes', ['group_key'], unique=False)
+    op.create_index('ix_sales_fact_changes_report_run_id', 'sales_fact_changes', ['report_run_id'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_sales_fact_changes_report_run_id', table_name='sales_fact_changes')
+    op.drop_index('ix_sales_fact_changes_group_key', table_name='sales_fact_changes')
+    op.drop_table('sales_fact_changes')
+    # ### end Alembic commands ###
+    op.drop_index('ux_sales_fact_group_key', table_name='sales_fact')
+    op.drop_column('sales_fact', 'row_hash')
+    op.drop_column('sales_fact', 'group_key')
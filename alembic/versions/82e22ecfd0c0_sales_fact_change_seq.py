@@ -0,0 +1,51 @@
+"""sales_fact.change_seq for change-data feed
+
+Revision ID: 82e22ecfd0c0
+Revises: 30d1bc314720
+Create Date: 2026-10-19 15:12:08.517340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '82e22ecfd0c0'
+down_revision: Union[str, None] = '30d1bc314720'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('sales_fact_change_seq')))
+    op.add_column('sales_fact', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+
+    # существующие строки нумеруем в порядке id -- первый проход потребителя (after=0) отдаст всё
+    op.execute(
+        """
+        UPDATE sales_fact f
+        SET change_seq = s.seq
+        FROM (
+            SELECT o.id, nextval('sales_fact_change_seq') AS seq
+            FROM (SELECT id FROM sales_fact ORDER BY id) o
+        ) s
+        WHERE s.id = f.id
+        """
+    )
+
+    op.alter_column(
+        'sales_fact', 'change_seq',
+        existing_type=sa.BigInteger(),
+        server_default=sa.text("nextval('sales_fact_change_seq')"),
+        nullable=False,
+    )
+    op.execute("ALTER SEQUENCE sales_fact_change_seq OWNED BY sales_fact.change_seq")
+    op.create_index('ux_sales_fact_change_seq', 'sales_fact', ['change_seq'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_sales_fact_change_seq', table_name='sales_fact')
+    # sequence принадлежит колонке (OWNED BY) и удаляется вместе с ней
+    op.drop_column('sales_fact', 'change_seq')
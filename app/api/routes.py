@@ -1,24 +1,74 @@
 from __future__ import annotations
-from datetime import date
+import zipfile
+from datetime import date, timedelta
 from app.services.sales_pipeline import SalesPipelineService
 
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.db import get_db
+from app.core.db import get_async_db, get_db, pool_status
 from app.core.crypto import encrypt_str
+from app.core.config import settings
+from app.core.ratelimit import rate_limit_metrics
+from app.core.response_cache import cached_json, months_between, response_cache
+from app.core.sql_profiler import SortKey, sql_profiler
 from app.models.account import MerchantAccount, AccountType
+from app.models.store import UnmatchedStoreName
+from app.models.sales import ReportRun
+from app.models.upload import UploadSession
+from app.services.report_progress import publish_status, report_run_event_stream
+from app.services.report_queue import ReportRunQueue
+from app.services.sales_changes import SalesChangeFeed
+from app.services.sales_export import MEDIA_TYPES, ExportFormat, SalesExportService
+from app.services.sales_summary import SalesSummaryService
 from app.services.stores import StoresService
-from app.services.sales_ingest import SalesIngestService
+from app.services.uploads import (
+    UploadOffsetMismatch, UploadService, create_manual_report_run, describe, run_upload_ingest,
+)
+from app.services.sku_resolver import SkuResolverService
+from app.services.sku_sales import SkuSalesService
 
 router = APIRouter()
 
 @router.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
 
+@router.get("/debug/alif-rate-limits")
+async def alif_rate_limits():
+    return rate_limit_metrics()
+
+
+@router.get("/debug/db-pool")
+async def db_pool():
+    return pool_status()
+
+
+@router.get("/debug/sql-stats")
+async def sql_stats(top: int = Query(20, ge=1, le=500), order: SortKey = "total"):
+    if not settings.sql_profile_enabled:
+        return {"enabled": False}
+    return sql_profiler().snapshot(n=top, order=order)
+
+
+@router.delete("/debug/sql-stats")
+async def sql_stats_reset():
+    if settings.sql_profile_enabled:
+        sql_profiler().reset()
+    return {"ok": True}
+
+
+@router.get("/debug/response-cache")
+async def response_cache_stats():
+    return response_cache().stats()
+
+
 class AccountCreate(BaseModel):
     account_type: AccountType
     username: str = Field(..., max_length=64)
@@ -47,8 +97,100 @@ def sales_report_run(payload: SalesReportRunRequest, db: Session = Depends(get_d
     )
 
 
+class ReportRunEnqueueRequest(BaseModel):
+    type_id: int = 12
+    date_from: date
+    date_to: date
+    store_id: int | None = None
+
+@router.post("/sales/report-runs")
+def enqueue_report_run(payload: ReportRunEnqueueRequest, db: Session = Depends(get_db)):
+    rr = ReportRunQueue(db).enqueue(
+        type_id=payload.type_id,
+        date_from=payload.date_from,
+        date_to=payload.date_to,
+        store_id=payload.store_id,
+    )
+    return {"report_run_id": rr.id, "status": rr.status}
+
+
+@router.get("/sales/report-runs/{report_run_id}")
+async def get_report_run(report_run_id: int, db: AsyncSession = Depends(get_async_db)):
+    rr = await db.get(ReportRun, report_run_id)
+    if rr is None:
+        raise HTTPException(status_code=404, detail="ReportRun не найден")
+    return {
+        "id": rr.id,
+        "report_id": rr.report_id,
+        "type_id": rr.type_id,
+        "date_from": str(rr.date_from),
+        "date_to": str(rr.date_to),
+        "status": rr.status,
+        "attempts": rr.attempts,
+        "lease_owner": rr.lease_owner,
+        "lease_expires_at": rr.lease_expires_at,
+        "last_error": rr.last_error,
+        "progress": rr.progress,
+    }
+
+
+@router.get("/sales/report-runs/{report_run_id}/events")
+async def report_run_events(report_run_id: int, db: AsyncSession = Depends(get_async_db)):
+    if await db.get(ReportRun, report_run_id) is None:
+        raise HTTPException(status_code=404, detail="ReportRun не найден")
+    # стрим открывает свои сессии: зависимость db закроется до начала отдачи тела
+    return StreamingResponse(
+        report_run_event_stream(report_run_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/sales/changes")
+async def sales_changes(after: int = 0, limit: int = 1000):
+    if after < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="after >= 0, limit >= 1")
+    # NDJSON: одна строка sales_fact на линию, следующий запрос -- after=<change_seq последней строки>
+    return StreamingResponse(
+        SalesChangeFeed().stream(after=after, limit=limit),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/sales/facts")
+async def export_sales_facts(
+    format: ExportFormat = "ndjson",
+    date_from: date | None = None,
+    date_to: date | None = None,
+    store_id: int | None = None,
+    sku: str | None = None,
+    after_id: int = 0,
+    limit: int | None = Query(default=None, ge=1),
+):
+    stream = SalesExportService().facts(
+        fmt=format, date_from=date_from, date_to=date_to, store_id=store_id, sku=sku,
+        after_id=after_id, limit=limit,
+    )
+    return StreamingResponse(stream, media_type=MEDIA_TYPES[format])
+
+
+@router.get("/sales/report-runs/{report_run_id}/raw")
+async def export_report_run_raw(
+    report_run_id: int,
+    format: ExportFormat = "ndjson",
+    after_id: int = 0,
+    limit: int | None = Query(default=None, ge=1),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(ReportRun, report_run_id) is None:
+        raise HTTPException(status_code=404, detail="ReportRun не найден")
+    stream = SalesExportService().raw(report_run_id, fmt=format, after_id=after_id, limit=limit)
+    return StreamingResponse(stream, media_type=MEDIA_TYPES[format])
+
+
 @router.post("/accounts")
-def create_account(payload: AccountCreate, db: Session = Depends(get_db)):
+async def create_account(payload: AccountCreate, db: AsyncSession = Depends(get_async_db)):
     acc = MerchantAccount(
         account_type=payload.account_type,
         username=payload.username,
@@ -57,8 +199,8 @@ def create_account(payload: AccountCreate, db: Session = Depends(get_db)):
         store_name=payload.store_name,
     )
     db.add(acc)
-    db.commit()
-    db.refresh(acc)
+    await db.commit()
+    await db.refresh(acc)
     return {"id": acc.id, "account_type": acc.account_type, "username": acc.username}
 
 
@@ -68,9 +210,186 @@ def sync_stores(db: Session = Depends(get_db)):
     return svc.sync()
 
 
+@router.get("/stores/unmatched")
+async def unmatched_stores(limit: int = Query(default=500, ge=1, le=5000), db: AsyncSession = Depends(get_async_db)):
+    rows = (
+        await db.execute(
+            select(UnmatchedStoreName).order_by(UnmatchedStoreName.last_seen_at.desc()).limit(limit)
+        )
+    ).scalars().all()
+    return [
+        {
+            "name": u.name,
+            "normalized": u.normalized,
+            "groups_seen": u.groups_seen,
+            "last_report_run_id": u.last_report_run_id,
+            "first_seen_at": u.first_seen_at,
+            "last_seen_at": u.last_seen_at,
+        }
+        for u in rows
+    ]
+
+
+@router.post("/skus/resolve")
+def resolve_skus(limit: int = 1000, db: Session = Depends(get_db)):
+    svc = SkuResolverService(db)
+    return svc.resolve_pending(limit=limit)
+
+
+@router.get("/skus/{sku}/sales")
+async def sku_sales(
+    request: Request,
+    sku: str,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    store_id: int | None = None,
+    days: int = 90,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # дефолты здесь, а не в сервисе: ключ кеша и его месяцы -- по фактическому диапазону
+    date_to = date_to or date.today()
+    date_from = date_from or (date_to - timedelta(days=days))
+    svc = SkuSalesService(db)
+    return await cached_json(
+        request,
+        key=("sku_sales", sku, date_from, date_to, store_id),
+        compute=lambda: svc.sku_sales(sku, date_from=date_from, date_to=date_to, store_id=store_id),
+        months=months_between(date_from, date_to),
+        stores=None if store_id is None else frozenset({store_id}),
+    )
+
+
+@router.get("/sales/summary")
+async def sales_summary(
+    request: Request,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    store_id: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    svc = SalesSummaryService(db)
+    return await cached_json(
+        request,
+        key=("sales_summary", date_from, date_to, store_id),
+        compute=lambda: svc.monthly_by_store(date_from=date_from, date_to=date_to, store_id=store_id),
+        months=months_between(date_from, date_to),
+        stores=None if store_id is None else frozenset({store_id}),
+    )
+
+
 @router.post("/sales/ingest")
-def ingest_sales(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    content = file.file.read()
-    svc = SalesIngestService(db)
-    result = svc.ingest_excel_bytes(content)
-    return result
\ No newline at end of file
+def ingest_sales(file: UploadFile = File(...), store_id: int | None = None, db: Session = Depends(get_db)):
+    from app.services.sales_ingest import SalesIngestService  # pandas -- лениво
+
+    rr = create_manual_report_run(db, label=f"upload:{file.filename}", store_id=store_id)
+    svc = SalesIngestService()
+    try:
+        result = svc.ingest_excel(db=db, report_run_id=rr.id, source=file.file, store_id=store_id)
+    except Exception as e:
+        # иначе ReportRun навсегда остаётся CREATED
+        db.rollback()
+        rr.status = "FAILED"
+        rr.last_error = f"{type(e).__name__}: {e}"
+        db.commit()
+        publish_status(rr.id, rr.status)
+        raise
+    rr.status = "INGESTED"
+    db.commit()
+    publish_status(rr.id, rr.status)
+    return result
+
+
+@router.post("/sales/ingest/batch")
+def ingest_sales_batch(
+    files: list[UploadFile] = File(...),
+    store_id: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """Несколько xlsx и/или ZIP с xlsx: каждый лист -- свой ReportRun, sales_fact -- один проход в конце."""
+    from app.services.batch_ingest import BatchIngestService  # pandas -- лениво
+
+    sources = [(f.filename or f"file{i}", f.file) for i, f in enumerate(files)]
+    try:
+        return BatchIngestService(db).ingest(sources, store_id=store_id)
+    except (ValueError, zipfile.BadZipFile) as e:
+        # битый ZIP или распакованный объём больше лимита -- ошибка запроса, а не 500
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ---------- загрузка по частям ----------
+
+class UploadInitRequest(BaseModel):
+    filename: str | None = Field(None, max_length=256)
+    total_size: int | None = None
+    sha256: str | None = Field(None, min_length=64, max_length=64)
+    store_id: int | None = None
+
+async def _read_chunk(request: Request) -> bytes:
+    """Тело PUT не больше upload_max_chunk_bytes: без Content-Length (chunked) -- обрываем по ходу чтения."""
+    limit = settings.upload_max_chunk_bytes
+    too_large = HTTPException(status_code=413, detail=f"часть больше {limit} байт")
+    length = request.headers.get("content-length")
+    if length is not None:
+        if not length.isdigit():
+            raise HTTPException(status_code=400, detail="некорректный Content-Length")
+        if int(length) > limit:
+            raise too_large
+    buf = bytearray()
+    async for piece in request.stream():
+        buf += piece
+        if len(buf) > limit:
+            raise too_large
+    return bytes(buf)
+
+
+def _upload_error(e: Exception) -> HTTPException:
+    if isinstance(e, UploadOffsetMismatch):
+        return HTTPException(status_code=409, detail={"error": str(e), "expected_offset": e.expected})
+    if isinstance(e, LookupError):
+        return HTTPException(status_code=404, detail=str(e))
+    return HTTPException(status_code=400, detail=str(e))
+
+@router.post("/sales/uploads")
+def upload_init(payload: UploadInitRequest, db: Session = Depends(get_db)):
+    up = UploadService(db).init(
+        filename=payload.filename,
+        total_size=payload.total_size,
+        sha256=payload.sha256,
+        store_id=payload.store_id,
+    )
+    return {**describe(up), "max_chunk_bytes": settings.upload_max_chunk_bytes}
+
+
+@router.put("/sales/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    data = await _read_chunk(request)
+    try:
+        up = await run_in_threadpool(UploadService(db).write_chunk, upload_id, offset, data, x_chunk_sha256)
+    except (ValueError, LookupError) as e:
+        raise _upload_error(e)
+    return describe(up)
+
+
+@router.post("/sales/uploads/{upload_id}/complete")
+def upload_complete(upload_id: str, background: BackgroundTasks, db: Session = Depends(get_db)):
+    try:
+        up, queued = UploadService(db).complete(upload_id)
+    except (ValueError, LookupError) as e:
+        raise _upload_error(e)
+    if queued:
+        background.add_task(run_upload_ingest, up.id)
+    return describe(up)
+
+
+@router.get("/sales/uploads/{upload_id}")
+async def upload_status(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    up = await db.get(UploadSession, upload_id)
+    if up is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    return describe(up)
\ No newline at end of file
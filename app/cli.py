@@ -0,0 +1,55 @@
+# app/cli.py
+# служебные команды: python -m app.cli <command>
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from app.core.db import SessionLocal, get_engine
+
+
+def _rotate_secrets(args: argparse.Namespace) -> dict:
+    from app.services.secrets_rotation import SecretsRotationService
+
+    db = SessionLocal(bind=get_engine())
+    try:
+        return SecretsRotationService(db).rotate_all(batch_size=args.batch_size)
+    finally:
+        db.close()
+
+
+def _ingest_batch(args: argparse.Namespace) -> dict:
+    from app.services.batch_ingest import BatchIngestService  # pandas -- лениво
+
+    db = SessionLocal(bind=get_engine())
+    try:
+        return BatchIngestService(db).ingest(
+            [(str(p), p) for p in args.paths], store_id=args.store_id, workers=args.workers
+        )
+    finally:
+        db.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rotate-secrets", help="перешифровать merchant_accounts текущим APP_SECRET_KEY")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=_rotate_secrets)
+
+    p = sub.add_parser("ingest-batch", help="загрузить несколько xlsx / ZIP с xlsx (каждый лист -- свой ReportRun)")
+    p.add_argument("paths", nargs="+", type=Path)
+    p.add_argument("--store-id", type=int, default=None)
+    p.add_argument("--workers", type=int, default=None, help="процессов на разбор листов (по умолчанию batch_ingest_workers)")
+    p.set_defaults(func=_ingest_batch)
+
+    args = parser.parse_args(argv)
+    result = args.func(args)
+    print(json.dumps(result, ensure_ascii=False, default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
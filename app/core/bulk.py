@@ -0,0 +1,89 @@
+# app/core/bulk.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Sequence
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import Insert
+from sqlalchemy.orm import Session
+
+# жёсткий лимит протокола PostgreSQL на число bind-параметров в одном statement
+PG_MAX_BIND_PARAMS = 65535
+
+
+@dataclass
+class UpsertBatch:
+    rows: int
+    inserted: int
+    updated: int
+
+
+@dataclass
+class UpsertStats:
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    batches: list[UpsertBatch] = field(default_factory=list)
+
+    @property
+    def affected(self) -> int:
+        return self.inserted + self.updated
+
+
+def batch_size_for(n_cols: int, max_rows: int | None = None) -> int:
+    """
+    Сколько строк влезает в один INSERT ... VALUES, чтобы не превысить лимит bind-параметров.
+    max_rows дополнительно ограничивает партию (короче транзакция -> короче блокировки строк).
+    """
+    size = max(1, PG_MAX_BIND_PARAMS // max(1, n_cols))
+    if max_rows:
+        size = min(size, max_rows)
+    return size
+
+
+def chunked_upsert(
+    db: Session,
+    build_stmt: Callable[[Sequence[dict]], Insert],
+    rows: Sequence[dict],
+    *,
+    max_rows: int | None = None,
+    commit_between: bool = False,
+    on_batch: Callable[[UpsertStats], None] | None = None,
+) -> UpsertStats:
+    """
+    Пишет rows партиями через build_stmt(chunk) -> pg_insert(...).values(chunk).on_conflict_...
+
+    Размер партии считается от числа колонок в строке.
+    Счётчики точные: RETURNING (xmax = 0) отличает вставленные строки от обновлённых,
+    строки, пропущенные через ON CONFLICT DO NOTHING, не возвращаются вовсе.
+    commit_between=True коммитит после каждой партии (блокировки sales_fact держатся недолго).
+    on_batch(stats) -- после каждой партии, с накопленными счётчиками (прогресс).
+    """
+    stats = UpsertStats()
+    if not rows:
+        return stats
+
+    size = batch_size_for(len(rows[0]), max_rows=max_rows)
+    inserted_flag = literal_column("(xmax = 0)").label("inserted")
+
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        stmt = build_stmt(chunk).returning(inserted_flag)
+
+        flags = db.execute(stmt).scalars().all()
+        ins = sum(1 for f in flags if f)
+        upd = len(flags) - ins
+
+        stats.rows += len(chunk)
+        stats.inserted += ins
+        stats.updated += upd
+        stats.batches.append(UpsertBatch(rows=len(chunk), inserted=ins, updated=upd))
+
+        if commit_between:
+            db.commit()
+        if on_batch is not None:
+            on_batch(stats)
+
+    return stats
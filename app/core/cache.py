@@ -0,0 +1,88 @@
+# app/core/cache.py
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный in-process кеш: LRU-вытеснение по maxsize + TTL на запись.
+    on_evict(key, value) вызывается для каждой вытесненной/протухшей/удалённой записи.
+    """
+
+    def __init__(self, maxsize: int, ttl_sec: float, on_evict: Callable[[Hashable, Any], None] | None = None):
+        self.maxsize = int(maxsize)
+        self.ttl_sec = float(ttl_sec)
+        self.on_evict = on_evict
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                self._evicted(key, value)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_sec if ttl_sec is None else ttl_sec)
+        with self._lock:
+            old = self._data.get(key, _MISSING)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if old is not _MISSING and old[1] is not value:
+                self._evicted(key, old[1])
+            while len(self._data) > self.maxsize:
+                k, (_, v) = self._data.popitem(last=False)
+                self._evicted(k, v)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Как get, но без LRU-продвижения и без учёта в hits/misses."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+        if item is _MISSING or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            if item is _MISSING:
+                return default
+            self._evicted(key, item[1])
+        return item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            items = list(self._data.items())
+            self._data.clear()
+            for k, (_, v) in items:
+                self._evicted(k, v)
+
+    def _evicted(self, key: Hashable, value: Any) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
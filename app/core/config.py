@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -5,6 +8,12 @@ class Settings(BaseSettings):
 
     database_url: str
     app_secret_key: str
+    # прежние ключи: ещё расшифровываем ими, шифруем только app_secret_key (MultiFernet)
+    app_secret_keys_old: list[str] = []
+
+    # кеш расшифрованных секретов (пароли/refresh токены) в памяти процесса
+    secrets_cache_size: int = 1024
+    secrets_cache_ttl_sec: int = 300
 
     alif_api_key: str
     alif_locale: str = "ru"
@@ -13,4 +22,101 @@ class Settings(BaseSettings):
     alif_api_base: str = "https://api-merchant.alif.uz"
     alif_reports_base: str = "https://api-merchant.alif.uz/merchant/excel/excel/v1/reports"
 
-settings = Settings()
+    # лимиты исходящих запросов к Alif (req/sec на класс эндпоинтов; "api" -- всё остальное)
+    alif_rate_limits: dict[str, float] = {
+        "generate": 0.5,
+        "check": 2.0,
+        "download": 0.5,
+        "auth": 1.0,
+        "api": 5.0,
+    }
+    alif_rate_burst: int = 3
+    alif_max_429_retries: int = 5
+
+    # загрузка xlsx по частям
+    upload_dir: str = "/tmp/alif_uploads"
+    upload_max_chunk_bytes: int = 16 * 1024 * 1024
+
+    # события прогресса ingest (SSE)
+    progress_min_interval_sec: float = 1.0
+    progress_sse_fallback_sec: float = 5.0
+
+    # пул соединений (отдельно у sync и async engine)
+    db_pool_class: Literal["queue", "null"] = "queue"  # null -- соединения держит PgBouncer
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_sec: int = 30
+    db_pool_recycle_sec: int = 1800  # -1 = не пересоздавать
+    db_pool_pre_ping: bool = True
+    db_pool_use_lifo: bool = False  # LIFO: лишние соединения простаивают и закрываются сервером/пулером
+    db_statement_timeout_ms: int = 0  # 0 = без ограничения
+    # PgBouncer в transaction mode: без prepared statements и startup-параметров.
+    # Session-level advisory lock планировщика (sync_scheduler) требует session mode или прямого подключения.
+    db_pgbouncer: bool = False
+    # psycopg3: prepare после N выполнений одного SQL (None = никогда), сколько prepared держать на соединение
+    db_prepare_threshold: int | None = 5
+    db_prepared_max: int = 100
+    # кеш компиляции SQLAlchemy (на engine)
+    db_query_cache_size: int = 500
+
+    # профиль SQL (GET /debug/sql-stats): время по нормализованным statement + EXPLAIN медленных
+    sql_profile_enabled: bool = False
+    sql_profile_slow_ms: float = 200.0
+    sql_profile_explain: bool = True
+    sql_profile_explain_interval_sec: float = 300.0  # не чаще раза на statement
+    sql_profile_max_statements: int = 1000
+
+    # sync-роуты (HTTP к Alif, pandas) крутятся в threadpool; размер пула
+    threadpool_size: int = 40
+
+    # ingest: upsert партиями (размер ещё ограничен лимитом bind-параметров PG)
+    ingest_batch_max_rows: int = 5000
+    ingest_commit_between_batches: bool = False
+
+    # пакетный ingest (несколько xlsx / ZIP): листы разбираются в отдельных процессах,
+    # sales_fact пишется один раз в конце
+    batch_ingest_workers: int = 4
+    batch_ingest_max_unzipped_bytes: int = 1024 * 1024 * 1024
+
+    # кеш ответов read-эндпоинтов sales (инвалидируется ingest-ом по месяцам/магазинам)
+    response_cache_size: int = 512
+    response_cache_ttl_sec: int = 300
+
+    # индекс normalize(stores.name) -> stores.id для store_id в sales_fact
+    store_index_ttl_sec: int = 300
+
+    # резолв SKU против каталога Alif
+    alif_catalog_url: str = "https://api-merchant.alif.uz/merchant/catalog/v1/offers/by-sku"
+    sku_resolve_batch_size: int = 100
+    sku_resolve_concurrency: int = 4
+    sku_resolve_cache_size: int = 50_000
+    sku_resolve_cache_ttl_sec: int = 6 * 3600
+    sku_resolve_after_ingest: bool = False
+    # MISSING перепроверяется не раньше чем через столько (больше sku_resolve_cache_ttl_sec, иначе ответит кеш)
+    sku_missing_recheck_sec: int = 24 * 3600
+
+    # планировщик инкрементального синка (в процессе API или python -m app.worker)
+    sync_scheduler_enabled: bool = False
+    sync_interval_sec: int = 3600
+    sync_type_ids: list[int] = [12]
+    sync_initial_days: int = 7
+    sync_poll_sec: int = 10
+    sync_timeout_sec: int = 900
+
+    # очередь report_runs (lease через SELECT ... FOR UPDATE SKIP LOCKED)
+    queue_worker_enabled: bool = False
+    queue_concurrency: int = 1
+    queue_lease_sec: int = 300
+    queue_max_attempts: int = 3
+    queue_poll_sec: int = 5
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+class _LazySettings:
+    # Settings() (чтение env/.env + валидация) -- при первом обращении к атрибуту, а не при импорте
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+settings: Settings = _LazySettings()  # type: ignore[assignment]
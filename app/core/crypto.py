@@ -1,5 +1,7 @@
-import base64, hashlib
-from cryptography.fernet import Fernet
+import base64, hashlib, threading
+from functools import lru_cache
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 def _derive_key(secret: str) -> bytes:
@@ -7,10 +9,57 @@ def _derive_key(secret: str) -> bytes:
     digest = hashlib.sha256(secret.encode("utf-8")).digest()
     return base64.urlsafe_b64encode(digest)
 
-_fernet = Fernet(_derive_key(settings.app_secret_key))
+# ключи и кеш строятся при первом использовании, не при импорте
+@lru_cache
+def _keys() -> tuple[Fernet, MultiFernet]:
+    # первый ключ -- текущий (им шифруем), остальные -- только для расшифровки старых значений
+    primary = Fernet(_derive_key(settings.app_secret_key))
+    return primary, MultiFernet([primary] + [Fernet(_derive_key(s)) for s in settings.app_secret_keys_old])
+
+
+def _zero(_key, plain: bytearray) -> None:
+    # вытесненный plaintext затираем в памяти
+    plain[:] = b"\0" * len(plain)
+
+# sha256(ciphertext) -> bytearray(plaintext); все обращения под _lock,
+# чтобы вытеснение (и затирание) не попало между get и decode в другом потоке
+_lock = threading.Lock()
+
+@lru_cache
+def _cache() -> TTLCache:
+    return TTLCache(
+        maxsize=settings.secrets_cache_size,
+        ttl_sec=settings.secrets_cache_ttl_sec,
+        on_evict=_zero,
+    )
+
+def _cache_key(value: str) -> bytes:
+    return hashlib.sha256(value.encode("utf-8")).digest()
 
 def encrypt_str(value: str) -> str:
-    return _fernet.encrypt(value.encode("utf-8")).decode("utf-8")
+    return _keys()[1].encrypt(value.encode("utf-8")).decode("utf-8")
 
 def decrypt_str(value: str) -> str:
-    return _fernet.decrypt(value.encode("utf-8")).decode("utf-8")
+    key = _cache_key(value)
+    with _lock:
+        plain = _cache().get(key)
+        if plain is not None:
+            return plain.decode("utf-8")
+
+    plain = bytearray(_keys()[1].decrypt(value.encode("utf-8")))
+    out = plain.decode("utf-8")
+    with _lock:
+        _cache().set(key, plain)
+    return out
+
+def needs_rotation(value: str) -> bool:
+    """True, если значение зашифровано не текущим ключом."""
+    try:
+        _keys()[0].extract_timestamp(value.encode("utf-8"))  # проверяет подпись без расшифровки
+        return False
+    except InvalidToken:
+        return True
+
+def rotate_str(value: str) -> str:
+    """Перешифровать значение текущим ключом (MultiFernet.rotate)."""
+    return _keys()[1].rotate(value.encode("utf-8")).decode("utf-8")
@@ -1,13 +1,203 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
+from app.core.sql_profiler import sql_profiler
+
+
+class PoolMetrics:
+    """
+    Счётчики пула одного engine: checkout/checkin/connect/invalidate + ожидание свободного соединения.
+    Ожидание меряется вокруг QueuePool._do_get (см. _Metered*Pool), перцентили -- по последним WINDOW выдачам.
+    """
+
+    WINDOW = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=self.WINDOW)
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total_sec = 0.0
+        self.wait_max_sec = 0.0
+
+    def observe_wait(self, sec: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._waits.append(sec)
+            self.wait_total_sec += sec
+            self.wait_max_sec = max(self.wait_max_sec, sec)
+            if timed_out:
+                self.timeouts += 1
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            out = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_total_sec": round(self.wait_total_sec, 6),
+                "wait_max_ms": round(self.wait_max_sec * 1000, 3),
+            }
+        for p in (50, 95, 99):
+            out[f"wait_p{p}_ms"] = round(waits[min(len(waits) - 1, len(waits) * p // 100)] * 1000, 3) if waits else None
+        return out
+
+
+class _MetricsCarrier:
+    metrics: PoolMetrics
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics  # dispose()/invalidate всего пула: счётчики не обнуляются
+        return pool
+
+
+class _MeteredMixin(_MetricsCarrier):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe_wait(time.perf_counter() - start)
+        return conn
+
+
+class _MeteredQueuePool(_MeteredMixin, QueuePool):
+    pass
+
+
+class _MeteredAsyncQueuePool(_MeteredMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class _MeteredNullPool(_MetricsCarrier, NullPool):
+    # ожидания нет (соединение открывается на каждый checkout), только счётчики событий
+    pass
+
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+def _pool_kwargs(pool_class) -> dict:
+    if settings.db_pool_class == "null":
+        # соединения держит внешний пулер (PgBouncer): открываем/закрываем на каждый checkout
+        return {"poolclass": _MeteredNullPool}
+    return {
+        "poolclass": pool_class,
+        # pre_ping -- лишний round trip на каждый checkout; без него от мёртвых соединений
+        # спасают pool_recycle и инвалидация пула на первой ошибке disconnect
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_sec,
+        "pool_recycle": settings.db_pool_recycle_sec,
+        "pool_use_lifo": settings.db_pool_use_lifo,
+    }
+
+
+def _engine_kwargs(pool_class) -> dict:
+    kwargs = {**_pool_kwargs(pool_class), "query_cache_size": settings.db_query_cache_size}
+    # PgBouncer в transaction mode не пропускает startup-параметры: statement_timeout -- на роли/БД
+    if settings.db_statement_timeout_ms and not settings.db_pgbouncer:
+        kwargs["connect_args"] = {"options": f"-c statement_timeout={int(settings.db_statement_timeout_ms)}"}
+    return kwargs
+
+
+def _instrument(engine: Engine) -> None:
+    pool = engine.pool
+    pool.metrics = metrics = PoolMetrics()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        metrics.incr("connects")
+        # psycopg3: серверные prepared statements. Повторяющиеся upsert-партии одного размера
+        # дают один и тот же SQL -> после prepare_threshold выполнений идут как EXECUTE без парсинга.
+        # За PgBouncer (transaction mode) prepared statements живут на чужом серверном соединении -> выкл.
+        conn = getattr(dbapi_conn, "driver_connection", dbapi_conn)
+        if hasattr(conn, "prepare_threshold"):
+            conn.prepare_threshold = None if settings.db_pgbouncer else settings.db_prepare_threshold
+            conn.prepared_max = settings.db_prepared_max
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(*_):
+        metrics.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(*_):
+        metrics.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(*_):
+        metrics.incr("invalidations")
+
+    if settings.sql_profile_enabled:
+        sql_profiler().attach(engine)
+
+
+def _async_url(url: str):
+    # async engine работает через psycopg (v3) независимо от драйвера в DATABASE_URL
+    return make_url(url).set(drivername="postgresql+psycopg")
+
+
+# engine создаются при первом обращении, не при импорте (CLI/alembic/холодный старт воркера)
+@lru_cache
+def get_engine() -> Engine:
+    engine = create_engine(settings.database_url, **_engine_kwargs(_MeteredQueuePool))
+    _instrument(engine)
+    return engine
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    engine = create_async_engine(_async_url(settings.database_url), **_engine_kwargs(_MeteredAsyncQueuePool))
+    _instrument(engine.sync_engine)
+    return engine
+
+
+def pool_status() -> dict:
+    """Состояние пулов созданных engine (для /debug/db-pool)."""
+    out = {}
+    engines = []
+    if get_engine.cache_info().currsize:
+        engines.append(("sync", get_engine()))
+    if get_async_engine.cache_info().currsize:
+        engines.append(("async", get_async_engine().sync_engine))
+    for name, engine in engines:
+        pool = engine.pool
+        info = {"class": type(pool).__name__, "status": pool.status(), **pool.metrics.snapshot()}
+        if isinstance(pool, QueuePool):
+            info.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        out[name] = info
+    return out
+
+
+# bind передаётся при создании сессии: SessionLocal(bind=get_engine())
+SessionLocal = sessionmaker(autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
 
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
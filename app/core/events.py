@@ -0,0 +1,55 @@
+# app/core/events.py
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Hashable
+
+
+class EventBroker:
+    """
+    In-process pub/sub для SSE: publish можно звать из любого потока (ingest крутится в threadpool),
+    подписчики -- asyncio.Queue в event loop сервера.
+    Медленный подписчик теряет старые события (очередь ограничена), publisher никогда не ждёт.
+    """
+
+    QUEUE_SIZE = 256
+
+    def __init__(self):
+        self._subs: dict[Hashable, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Hashable) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subs[topic].add((asyncio.get_running_loop(), q))
+        return q
+
+    def unsubscribe(self, topic: Hashable, q: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subs.get(topic)
+            if not subs:
+                return
+            subs.difference_update({s for s in subs if s[1] is q})
+            if not subs:
+                del self._subs[topic]
+
+    def publish(self, topic: Hashable, event: Any) -> None:
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        for loop, q in subs:
+            try:
+                loop.call_soon_threadsafe(self._put, q, event)
+            except RuntimeError:
+                pass  # loop уже закрыт
+
+    @staticmethod
+    def _put(q: asyncio.Queue, event: Any) -> None:
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(event)
+
+
+broker = EventBroker()
@@ -0,0 +1,144 @@
+# app/core/ratelimit.py
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket с адаптацией под 429 (AIMD):
+    - 429 -> скорость делится пополам (не ниже min_rate), bucket закрыт до Retry-After
+    - каждый успешный ответ -> скорость плавно растёт обратно до базовой
+    Считает метрики ожидания в очереди.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = self.base_rate / 16
+        self.burst = max(1, int(burst))
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.wait_total_sec = 0.0
+        self.wait_max_sec = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Блокирует до получения токена; возвращает, сколько ждали (сек)."""
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now >= self._blocked_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        waited = now - start
+                        self.acquired += 1
+                        self.wait_total_sec += waited
+                        self.wait_max_sec = max(self.wait_max_sec, waited)
+                        return waited
+                    delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+                time.sleep(min(delay, 1.0))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def on_throttled(self, retry_after_sec: float | None) -> None:
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            pause = retry_after_sec if retry_after_sec is not None else 1 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+
+    def on_success(self) -> None:
+        if self.rate >= self.base_rate:
+            return
+        with self._lock:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def metrics(self) -> dict:
+        return {
+            "rate": round(self.rate, 3),
+            "base_rate": self.base_rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "waiting": self.waiting,
+            "throttled_429": self.throttled,
+            "wait_total_sec": round(self.wait_total_sec, 3),
+            "wait_avg_sec": round(self.wait_total_sec / self.acquired, 4) if self.acquired else 0.0,
+            "wait_max_sec": round(self.wait_max_sec, 3),
+        }
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(endpoint_class: str) -> TokenBucket:
+    """Один bucket на класс эндпоинтов (generate/check/download/auth/api) на процесс."""
+    with _buckets_lock:
+        b = _buckets.get(endpoint_class)
+        if b is None:
+            limits = settings.alif_rate_limits
+            rate = limits.get(endpoint_class, limits.get("api", 5.0))
+            b = _buckets[endpoint_class] = TokenBucket(endpoint_class, rate=rate, burst=settings.alif_rate_burst)
+        return b
+
+
+def rate_limit_metrics() -> dict:
+    with _buckets_lock:
+        return {name: b.metrics() for name, b in _buckets.items()}
+
+
+def _retry_after_sec(r: httpx.Response) -> float | None:
+    v = r.headers.get("retry-after")
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+
+def alif_request(client: httpx.Client, endpoint_class: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Все исходящие запросы к Alif/Keycloak идут через это: token bucket по классу эндпоинта,
+    на 429 -- ждём Retry-After, снижаем скорость и повторяем (до alif_max_429_retries раз).
+    """
+    b = bucket(endpoint_class)
+    for _ in range(settings.alif_max_429_retries + 1):
+        b.acquire()
+        r = client.request(method, url, **kwargs)
+        if r.status_code != 429:
+            b.on_success()
+            return r
+        b.on_throttled(_retry_after_sec(r))
+    return r
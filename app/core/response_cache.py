@@ -0,0 +1,168 @@
+# app/core/response_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from fastapi import Request, Response
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# None в months/stores записи -- "все" (нет ограничения по датам/магазину)
+Months = frozenset[str | None] | None
+Stores = frozenset[int | None] | None
+
+
+def month_of(d: date | None) -> str | None:
+    return None if d is None else f"{d.year:04d}-{d.month:02d}"
+
+
+def months_between(date_from: date | None, date_to: date | None) -> Months:
+    """Месяцы диапазона [date_from..date_to]; открытый диапазон -- все месяцы (None)."""
+    if date_from is None or date_to is None:
+        return None
+    out = set()
+    y, m = date_from.year, date_from.month
+    while (y, m) <= (date_to.year, date_to.month):
+        out.add(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return frozenset(out)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    months: Months
+    stores: Stores
+
+
+class ResponseCache:
+    """
+    Кеш готовых JSON-ответов read-эндпоинтов sales (LRU + TTL поверх TTLCache).
+    Запись помечена месяцами и магазинами, которые покрывает запрос; ingest инвалидирует
+    только записи, пересекающиеся с тем, что он реально поменял (месяцы x магазины).
+    Инвалидация in-process: изменения из другого процесса (worker) видны не позже TTL.
+    """
+
+    ALL = "*"
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl_sec=ttl_sec, on_evict=self._forget)
+        # месяц -> ключи записей (ALL -- записи без ограничения по датам)
+        self._by_month: dict[str | None, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.invalidated = 0
+        self.generation = 0
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        return self._cache.get(key)
+
+    def put(
+        self, key: Hashable, body: bytes, months: Months, stores: Stores, generation: int | None = None
+    ) -> CachedResponse:
+        item = CachedResponse(body=body, etag=etag_of(body), months=months, stores=stores)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return item  # пока считали, ingest что-то инвалидировал -- ответ мог устареть
+            generation = self.generation
+        # сначала set, потом индекс: set вытесняет прежнее значение ключа, и его _forget
+        # убрал бы ключ из индекса, уже записанного для новой записи
+        self._cache.set(key, item)
+        with self._lock:
+            stale = generation != self.generation
+            if not stale:
+                for m in (self.ALL,) if months is None else months:
+                    self._by_month.setdefault(m, set()).add(key)
+        if stale:
+            # invalidate прошёл между set и индексом и ключ не видел -- запись не оставляем
+            self._cache.pop(key)
+        return item
+
+    def invalidate(self, months: Iterable[str | None], stores: Iterable[int | None]) -> int:
+        months, stores = set(months), set(stores)
+        if not months:
+            return 0
+        with self._lock:
+            self.generation += 1  # вычисленное до инвалидации в кеш уже не попадёт (см. put)
+            candidates = set(self._by_month.get(self.ALL, ()))
+            for m in months:
+                candidates |= self._by_month.get(m, set())
+
+        dropped = 0
+        for key in candidates:
+            item = self._cache.peek(key)
+            if item is None or (item.stores is not None and not (item.stores & stores)):
+                continue  # другой магазин -- запись актуальна
+            if self._cache.pop(key) is not None:  # индекс чистит on_evict (_forget)
+                dropped += 1
+        self.invalidated += dropped
+        return dropped
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _forget(self, key: Hashable, item: CachedResponse) -> None:
+        with self._lock:
+            for m in (self.ALL,) if item.months is None else item.months:
+                keys = self._by_month.get(m)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self._by_month[m]
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "invalidated": self.invalidated}
+
+
+@lru_cache
+def response_cache() -> ResponseCache:
+    return ResponseCache(maxsize=settings.response_cache_size, ttl_sec=settings.response_cache_ttl_sec)
+
+
+def etag_of(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in {t.strip().removeprefix("W/") for t in header.split(",")}
+
+
+def _response(request: Request, item: CachedResponse, hit: bool) -> Response:
+    headers = {"ETag": item.etag, "Cache-Control": "no-cache", "X-Cache": "HIT" if hit else "MISS"}
+    if _not_modified(request, item.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=item.body, media_type="application/json", headers=headers)
+
+
+async def cached_json(
+    request: Request,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Any]],
+    months: Months = None,
+    stores: Stores = None,
+) -> Response:
+    """
+    Ответ из кеша или compute() с сохранением. ETag -- хеш тела, поэтому If-None-Match
+    даёт 304 и после пересчёта, если данные не поменялись.
+    """
+    cache = response_cache()
+    item = cache.get(key)
+    if item is not None:
+        return _response(request, item, hit=True)
+
+    generation = cache.generation
+    body = json.dumps(await compute(), ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+    item = cache.put(key, body, months=months, stores=stores, generation=generation)
+    return _response(request, item, hit=False)
@@ -0,0 +1,296 @@
+# app/core/sql_profiler.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal
+
+from sqlalchemy import Engine, event
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+SortKey = Literal["total", "mean", "max", "calls"]
+
+_START_KEY = "sql_profile_start"
+_SAVEPOINT = "sql_profile_explain"
+
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# psycopg-диалект рендерит параметры с типом: %(sku_1)s::VARCHAR, ::NUMERIC(12, 2), ::TIMESTAMP WITH TIME ZONE
+_CAST = re.compile(
+    r"\?::\w+(?:\s*\(\s*\?(?:\s*,\s*\?)*\s*\))?(?:\s+(?:WITH|WITHOUT)\s+TIME\s+ZONE)?(?:\[\])*",
+    re.IGNORECASE,
+)
+_TUPLE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")  # (?, ?, ?) -- строка VALUES / список IN
+_TUPLES = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")  # VALUES (?), (?), ... -- партия любого размера
+_SPACE = re.compile(r"\s+")
+
+# ANALYZE исполняет запрос повторно: только для SELECT без побочных эффектов.
+# DML, блокировки и последовательности -- план без исполнения (EXPLAIN без ANALYZE)
+_ANALYZABLE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_EXPLAINABLE = re.compile(r"^\s*(?:SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_SIDE_EFFECTS = re.compile(
+    r"\b(?:pg_advisory\w*|pg_try_advisory\w*|nextval|setval|INSERT|UPDATE|DELETE)\b|\bFOR\s+(?:UPDATE|SHARE|NO\s+KEY|KEY)\b",
+    re.IGNORECASE,
+)
+
+
+# длиннее -- в кеш идёт не текст, а его blake2b-digest: мультистрочный upsert до ~65k параметров
+# весит мегабайты, а у последней партии каждого ingest свой размер, т.е. свой текст
+_CACHE_MAX_TEXT = 8 * 1024
+_LONG_CACHE_SIZE = 1024
+_long_cache: dict[bytes, str] = {}
+_long_cache_lock = threading.Lock()
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Ключ агрегации: параметры и литералы -> ?, списки IN и партии VALUES любого размера -> (?).
+    Upsert-партии по 500 и по 5000 строк -- один ключ. Кеш: SQL из кеша компиляции SQLAlchemy
+    повторяется, regex на мегабайтный VALUES гоняется один раз; память кеша ограничена
+    (длинный текст не хранится, нормализованный длинный результат не кешируется).
+    """
+    if len(statement) <= _CACHE_MAX_TEXT:
+        return _normalize_cached(statement)
+
+    digest = hashlib.blake2b(statement.encode("utf-8"), digest_size=16).digest()
+    with _long_cache_lock:
+        key = _long_cache.get(digest)
+    if key is not None:
+        return key
+    key = _normalize(statement)
+    if len(key) <= _CACHE_MAX_TEXT:
+        with _long_cache_lock:
+            if len(_long_cache) >= _LONG_CACHE_SIZE:
+                del _long_cache[next(iter(_long_cache))]  # старейший (FIFO)
+            _long_cache[digest] = key
+    return key
+
+
+@lru_cache(maxsize=2048)
+def _normalize_cached(statement: str) -> str:
+    return _normalize(statement)
+
+
+def _normalize(statement: str) -> str:
+    s = _PARAM.sub("?", statement)
+    s = _STRING.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _SPACE.sub(" ", s).strip()
+    s = _CAST.sub("?", s)
+    s = _TUPLE.sub("(?)", s)
+    return _TUPLES.sub("(?)", s)
+
+
+@dataclass
+class StatementStats:
+    statement: str
+    calls: int = 0
+    total_sec: float = 0.0
+    max_sec: float = 0.0
+    rows: int = 0
+    slow: int = 0
+    plan: list[str] | None = None
+    plan_analyzed: bool = False
+    plan_call_ms: float | None = None  # длительность вызова, на котором снят план
+    plan_ts: float | None = None
+    plan_at: float | None = None  # monotonic, для интервала между EXPLAIN
+
+    def as_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total_sec * 1000, 3),
+            "mean_ms": round(self.total_sec * 1000 / self.calls, 3) if self.calls else None,
+            "max_ms": round(self.max_sec * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+            "plan": self.plan,
+            "plan_analyzed": self.plan_analyzed,
+            "plan_call_ms": self.plan_call_ms,
+            "plan_ts": self.plan_ts,
+        }
+
+
+class SqlProfiler:
+    """
+    Профиль SQL по событиям engine (before/after_cursor_execute), включается sql_profile_enabled:
+    - время каждого statement, агрегат по normalize_sql: calls / total / mean / max / rows
+    - вызов дольше sql_profile_slow_ms -> structured-лог (JSON) и, не чаще раза в
+      sql_profile_explain_interval_sec на ключ, план: EXPLAIN (ANALYZE, BUFFERS) для SELECT,
+      EXPLAIN без исполнения для DML. План снимается на том же соединении под SAVEPOINT:
+      ошибка EXPLAIN не ломает транзакцию вызывающего
+    - число ключей ограничено sql_profile_max_statements; что не влезло -- в счётчик dropped
+    """
+
+    def __init__(self, slow_ms: float, explain: bool, explain_interval_sec: float, max_statements: int):
+        self.slow_sec = slow_ms / 1000
+        self.explain = explain
+        self.explain_interval_sec = explain_interval_sec
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._stats: dict[str, StatementStats] = {}
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._on_error)
+
+    # ---------- события ----------
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+    @staticmethod
+    def _on_error(exception_context) -> None:
+        conn = exception_context.connection
+        if conn is not None and conn.info.get(_START_KEY):
+            conn.info[_START_KEY].pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get(_START_KEY)
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        key = normalize_sql(statement)
+        slow = elapsed >= self.slow_sec
+        now = time.monotonic()
+
+        want_plan = False
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None and len(self._stats) < self.max_statements:
+                st = self._stats[key] = StatementStats(statement=key)
+            if st is None:
+                self.dropped += 1  # медленный вызов всё равно попадёт в лог
+            else:
+                st.calls += 1
+                st.total_sec += elapsed
+                st.max_sec = max(st.max_sec, elapsed)
+                st.rows += max(cursor.rowcount or 0, 0)
+                if slow:
+                    st.slow += 1
+                want_plan = (
+                    slow
+                    and self.explain
+                    and not executemany
+                    and (st.plan_at is None or now - st.plan_at >= self.explain_interval_sec)
+                    and _EXPLAINABLE.match(statement) is not None
+                )
+                if want_plan:
+                    st.plan_at = now  # параллельный медленный вызов того же ключа план уже не снимает
+
+        if not slow:
+            return
+        log.warning(
+            "slow_sql %s",
+            json.dumps(
+                {"event": "slow_sql", "ms": round(elapsed * 1000, 3), "rows": cursor.rowcount,
+                 "executemany": bool(executemany), "statement": key[:1000]},
+                ensure_ascii=False,
+            ),
+        )
+        if want_plan:
+            self._explain(conn, key, statement, parameters, elapsed)
+
+    def _explain(self, conn, key: str, statement: str, parameters, elapsed: float) -> None:
+        analyze = _ANALYZABLE.match(statement) is not None and _SIDE_EFFECTS.search(statement) is None
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+        # курсор DBAPI напрямую: события engine не срабатывают, профиль сам себя не считает
+        cur = conn.connection.dbapi_connection.cursor()
+        try:
+            cur.execute(f"SAVEPOINT {_SAVEPOINT}")
+            try:
+                cur.execute(prefix + statement, parameters or None)
+                plan = [row[0] for row in cur.fetchall()]
+            except Exception:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+                raise
+            cur.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+        except Exception:
+            # вне транзакции (autocommit) SAVEPOINT недоступен, EXPLAIN мог не пройти -- профиль не важнее запроса
+            log.debug("sql profile: EXPLAIN не снят", exc_info=True)
+            return
+        finally:
+            cur.close()
+
+        with self._lock:
+            st = self._stats.get(key)
+            if st is not None:
+                st.plan, st.plan_analyzed = plan, analyze
+                st.plan_call_ms = round(elapsed * 1000, 3)
+                st.plan_ts = time.time()
+        log.warning(
+            "sql_plan %s",
+            json.dumps(
+                {"event": "sql_plan", "analyzed": analyze, "call_ms": round(elapsed * 1000, 3),
+                 "statement": key[:1000], "plan": plan},
+                ensure_ascii=False,
+            ),
+        )
+
+    # ---------- отчёт ----------
+
+    def top(self, n: int = 20, order: SortKey = "total") -> list[dict]:
+        sort_key = {
+            "total": lambda s: s.total_sec,
+            "mean": lambda s: s.total_sec / s.calls if s.calls else 0.0,
+            "max": lambda s: s.max_sec,
+            "calls": lambda s: s.calls,
+        }[order]
+        with self._lock:
+            stats = sorted(self._stats.values(), key=sort_key, reverse=True)[:n]
+            return [s.as_dict() for s in stats]
+
+    def snapshot(self, n: int = 20, order: SortKey = "total") -> dict:
+        with self._lock:
+            tracked = len(self._stats)
+            calls = sum(s.calls for s in self._stats.values())
+            total_sec = sum(s.total_sec for s in self._stats.values())
+        return {
+            "enabled": True,
+            "since": self.started_at,
+            "slow_ms": self.slow_sec * 1000,
+            "statements": tracked,
+            "dropped": self.dropped,
+            "calls": calls,
+            "total_ms": round(total_sec * 1000, 3),
+            "order": order,
+            "top": self.top(n, order),
+        }
+
+    def log_top(self, n: int = 20) -> None:
+        for i, s in enumerate(self.top(n), 1):
+            d = s.copy()
+            d.pop("plan")
+            log.info("sql_top %s", json.dumps({"event": "sql_top", "rank": i, **d}, ensure_ascii=False))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.dropped = 0
+            self.started_at = time.time()
+
+
+@lru_cache
+def sql_profiler() -> SqlProfiler:
+    """Один профиль на процесс, общий для sync и async engine."""
+    return SqlProfiler(
+        slow_ms=settings.sql_profile_slow_ms,
+        explain=settings.sql_profile_explain,
+        explain_interval_sec=settings.sql_profile_explain_interval_sec,
+        max_statements=settings.sql_profile_max_statements,
+    )
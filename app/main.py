@@ -1,5 +1,40 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from anyio import to_thread
 from fastapi import FastAPI
 from app.api.routes import router
+from app.core.config import settings
+from app.core.db import get_async_engine, get_engine
+from app.core.sql_profiler import sql_profiler
+from app.services.report_queue import run_queue_forever
+from app.services.sync_scheduler import run_forever
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # sync-роуты (отчёты Alif, ingest) живут в threadpool -- его размер настраиваемый
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+
+    # несколько реплик безопасно: тик без advisory lock просто пропускается
+    tasks = []
+    if settings.sync_scheduler_enabled:
+        tasks.append(asyncio.create_task(run_forever()))
+    if settings.queue_worker_enabled:
+        tasks += [asyncio.create_task(run_queue_forever()) for _ in range(settings.queue_concurrency)]
+    yield
+    for t in tasks:
+        t.cancel()
+        with suppress(asyncio.CancelledError):
+            await t
+    if settings.sql_profile_enabled:
+        sql_profiler().log_top()
+    # dispose только если engine реально создавался
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
 
-app = FastAPI(title="Alif Admin API")
+app = FastAPI(title="Alif Admin API", lifespan=lifespan)
 app.include_router(router)
@@ -0,0 +1,26 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+# Словари повторяющихся строк из отчёта Alif: в raw_sales_rows -- только int-ключ.
+# Только дописываются (id никогда не меняется и не удаляется) -> name<->id можно держать в памяти процесса.
+
+class DimStoreName(Base):
+    """Название магазина, как оно пришло в отчёте (не stores.id -- в отчёте id магазина нет)."""
+    __tablename__ = "dim_store_names"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+
+class DimRegion(Base):
+    """Регионы и районы (raw_sales_rows.region_id / district_id)."""
+    __tablename__ = "dim_regions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+
+class DimPartner(Base):
+    __tablename__ = "dim_partners"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(256), nullable=False, unique=True)
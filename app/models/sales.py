@@ -1,10 +1,12 @@
 import enum
 from sqlalchemy import (
-    Integer, String, Date, DateTime, Text, Numeric, Enum,
-    ForeignKey, UniqueConstraint, func
+    BigInteger, Integer, String, Date, DateTime, Text, Numeric, Enum,
+    ForeignKey, Index, Sequence, UniqueConstraint, func
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
+from app.models import dims  # noqa: F401  -- FK raw_sales_rows -> dim_*
 
 class SkuStatus(str, enum.Enum):
     ACTIVE = "active"
@@ -14,21 +16,48 @@ class SkuStatus(str, enum.Enum):
 
 class ReportRun(Base):
     __tablename__ = "report_runs"
+    __table_args__ = (
+        Index("ix_report_runs_status_lease", "status", "lease_expires_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     store_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # often report is for main, but keep
-    report_id: Mapped[str] = mapped_column(String(64), nullable=False)    # alif report_id
+    report_id: Mapped[str | None] = mapped_column(String(64), nullable=True)  # alif report_id (NULL пока run в очереди)
     type_id: Mapped[int] = mapped_column(Integer, nullable=False)
     date_from: Mapped[Date] = mapped_column(Date, nullable=False)
     date_to: Mapped[Date] = mapped_column(Date, nullable=False)
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="CREATED")
 
+    # lease для воркеров очереди (SELECT ... FOR UPDATE SKIP LOCKED)
+    lease_owner: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    lease_expires_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    # последнее событие прогресса ingest: {"stage", "done", "total", "ts"}
+    progress: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+class SyncWatermark(Base):
+    """
+    До какой даты (включительно) отчёт type_id уже загружен планировщиком.
+    """
+    __tablename__ = "sync_watermarks"
+
+    type_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_date_to: Mapped[Date] = mapped_column(Date, nullable=False)
+    last_report_run_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class RawSalesRow(Base):
     __tablename__ = "raw_sales_rows"
     __table_args__ = (
         UniqueConstraint("report_run_id", "source_row_no", name="uq_raw_report_row"),
+        # выгрузка строк отчёта keyset-ом по id
+        Index("ix_raw_sales_rows_report_run_id_id", "report_run_id", "id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -48,22 +77,25 @@ class RawSalesRow(Base):
     total: Mapped[Numeric | None] = mapped_column(Numeric(18, 2), nullable=True)
 
     marking: Mapped[str | None] = mapped_column(String(64), nullable=True)
-    store_name: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    # повторяющиеся строки -- ключами словарей (app/models/dims.py)
+    store_name_id: Mapped[int | None] = mapped_column(ForeignKey("dim_store_names.id"), nullable=True)
 
-    region: Mapped[str | None] = mapped_column(String(128), nullable=True)
-    district: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    region_id: Mapped[int | None] = mapped_column(ForeignKey("dim_regions.id"), nullable=True)
+    district_id: Mapped[int | None] = mapped_column(ForeignKey("dim_regions.id"), nullable=True)
     inn: Mapped[str | None] = mapped_column(String(32), nullable=True)
 
     period: Mapped[int | None] = mapped_column(Integer, nullable=True)
     first_payment_date: Mapped[str | None] = mapped_column(String(64), nullable=True)
     approval_date: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
-    partner_name: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    partner_id: Mapped[int | None] = mapped_column(ForeignKey("dim_partners.id"), nullable=True)
     invoice: Mapped[str | None] = mapped_column(String(128), nullable=True)
     return_type: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+sales_fact_change_seq = Sequence("sales_fact_change_seq", metadata=Base.metadata)
+
 class SalesFact(Base):
     __tablename__ = "sales_fact"
     __table_args__ = (
@@ -72,6 +104,13 @@ class SalesFact(Base):
             "store_id", "sale_date", "application_id", "sku", "price", "total", "invoice", "return_type",
             name="uq_sales_fact_group"
         ),
+        # тот же ключ одной колонкой (md5), без NULL -- цель ON CONFLICT и основа дельты
+        Index("ux_sales_fact_group_key", "group_key", unique=True),
+        # keyset-курсор GET /sales/changes
+        Index("ux_sales_fact_change_seq", "change_seq", unique=True),
+        # фильтры выгрузки GET /sales/facts (store_id + дата -- префикс uq_sales_fact_group)
+        Index("ix_sales_fact_sale_date", "sale_date"),
+        Index("ix_sales_fact_sku_sale_date", "sku", "sale_date"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -93,7 +132,37 @@ class SalesFact(Base):
     invoice: Mapped[str | None] = mapped_column(String(128), nullable=True)
     return_type: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
-    status: Mapped[str] = mapped_column(String(16), nullable=False, default="active")  # active/canceled
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="active")  # active/canceled/removed
+
+    group_key: Mapped[str] = mapped_column(String(32), nullable=False)  # md5 колонок uq_sales_fact_group
+    row_hash: Mapped[str] = mapped_column(String(32), nullable=False)   # md5(qty, status, название, магазин)
+
+    # монотонный номер изменения: nextval на каждый insert/update (см. sales_changes)
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger, server_default=sales_fact_change_seq.next_value(), nullable=False
+    )
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class SalesFactChange(Base):
+    """
+    Changelog sales_fact: что поменял очередной отчёт (added/removed/qty_changed/status_changed).
+    """
+    __tablename__ = "sales_fact_changes"
+    __table_args__ = (
+        Index("ix_sales_fact_changes_report_run_id", "report_run_id"),
+        Index("ix_sales_fact_changes_group_key", "group_key"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    report_run_id: Mapped[int] = mapped_column(ForeignKey("report_runs.id", ondelete="CASCADE"), nullable=False)
+    group_key: Mapped[str] = mapped_column(String(32), nullable=False)
+
+    change_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    old_qty: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    new_qty: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    old_status: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    new_status: Mapped[str | None] = mapped_column(String(16), nullable=True)
 
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
@@ -115,3 +184,31 @@ class SkuRegistry(Base):
     last_seen_title: Mapped[str | None] = mapped_column(Text, nullable=True)
     resolved_offer_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
     resolved_item_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # когда статус последний раз проверяли по каталогу (MISSING перепроверяются через sku_missing_recheck_sec)
+    resolved_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+class SkuSalesDaily(Base):
+    """
+    Предрасчитанный индекс продаж по (sku, store_id, sale_date).
+    Обновляется инкрементально в SalesIngestService после upsert в sales_fact.
+    """
+    __tablename__ = "sku_sales_daily"
+    __table_args__ = (
+        # store_id пока часто NULL -> NULLS NOT DISTINCT (PG15+), иначе ON CONFLICT не сработает
+        UniqueConstraint(
+            "sku", "store_id", "sale_date",
+            name="uq_sku_sales_daily", postgresql_nulls_not_distinct=True
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    sku: Mapped[str] = mapped_column(String(64), nullable=False)
+    store_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    sale_date: Mapped[Date | None] = mapped_column(Date, nullable=True)
+
+    qty: Mapped[int] = mapped_column(Integer, nullable=False, default=0)            # status=active
+    canceled_qty: Mapped[int] = mapped_column(Integer, nullable=False, default=0)   # status=canceled
+    revenue: Mapped[Numeric | None] = mapped_column(Numeric(18, 2), nullable=True)  # sum(total * qty) по active
+
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, DateTime, func
+from sqlalchemy import Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
 
@@ -10,3 +10,22 @@ class Store(Base):
 
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UnmatchedStoreName(Base):
+    """
+    Названия магазинов из отчётов, которые не удалось сопоставить со stores (см. store_resolver).
+    Очищается после /stores/sync от названий, которые стали сопоставляться.
+    """
+    __tablename__ = "unmatched_store_names"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+    normalized: Mapped[str] = mapped_column(String(128), nullable=False)
+
+    groups_seen: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # групп sales_fact с этим названием в последнем отчёте
+    last_report_run_id: Mapped[int | None] = mapped_column(
+        ForeignKey("report_runs.id", ondelete="SET NULL"), nullable=True
+    )
+
+    first_seen_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+class UploadSession(Base):
+    """
+    Загрузка xlsx по частям: init -> PUT чанков по offset -> complete -> фоновый ingest.
+    Файл пишется на диск (settings.upload_dir/<id>.xlsx), в БД -- только состояние.
+    """
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    filename: Mapped[str | None] = mapped_column(String(256), nullable=True)
+
+    total_size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # если клиент знает заранее
+    received_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    expected_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+    # UPLOADING / QUEUED / INGESTING / INGESTED / FAILED
+    status: Mapped[str] = mapped_column(String(32), nullable=False, default="UPLOADING")
+
+    report_run_id: Mapped[int | None] = mapped_column(ForeignKey("report_runs.id", ondelete="SET NULL"), nullable=True)
+    store_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    rows_total: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    rows_processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stage: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
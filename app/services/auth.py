@@ -10,7 +10,8 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.crypto import decrypt_str, encrypt_str
+from app.core.crypto import decrypt_str, encrypt_str, needs_rotation, rotate_str
+from app.core.ratelimit import alif_request
 from app.models.account import MerchantAccount
 
 
@@ -59,6 +60,9 @@ class AuthService:
     def _password(self, acc: MerchantAccount) -> str:
         username = acc.username
         password = decrypt_str(acc.password_enc)
+        # ленивая ротация ключа: зашифровано старым -> перешифруем, сохранится вместе с токенами
+        if needs_rotation(acc.password_enc):
+            acc.password_enc = rotate_str(acc.password_enc)
 
         data = {
             "client_id": settings.alif_client_id,
@@ -69,7 +73,10 @@ class AuthService:
         }
 
         with httpx.Client(timeout=60) as client:
-            r = client.post(
+            r = alif_request(
+                client,
+                "auth",
+                "POST",
                 settings.alif_auth_url,
                 data=data,  # form-urlencoded
                 headers={"accept": "application/json"},
@@ -103,7 +110,10 @@ class AuthService:
 
         try:
             with httpx.Client(timeout=60) as client:
-                r = client.post(
+                r = alif_request(
+                    client,
+                    "auth",
+                    "POST",
                     settings.alif_auth_url,
                     data=data,
                     headers={"accept": "application/json"},
@@ -132,8 +142,20 @@ class AuthService:
             acc.access_expires_at = _utcnow() + timedelta(seconds=expires_in - 60)
 
         # refresh у keycloak часто обновляется — сохраняем новый, если пришёл
+        # (если пришёл тот же самый -- не перешифровываем; старый ключ -- ротируем)
         if refresh_token:
-            acc.refresh_token_enc = encrypt_str(refresh_token)
+            if not self._same_refresh(acc, refresh_token):
+                acc.refresh_token_enc = encrypt_str(refresh_token)
+            elif needs_rotation(acc.refresh_token_enc):
+                acc.refresh_token_enc = rotate_str(acc.refresh_token_enc)
 
         # refresh_expires_at обычно не дают — оставим None (или можно хранить “как есть”)
         acc.refresh_expires_at = acc.refresh_expires_at
+
+    def _same_refresh(self, acc: MerchantAccount, refresh_token: str) -> bool:
+        if not acc.refresh_token_enc:
+            return False
+        try:
+            return decrypt_str(acc.refresh_token_enc) == refresh_token  # обычно из кеша
+        except Exception:
+            return False
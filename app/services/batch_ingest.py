@@ -0,0 +1,254 @@
+# app/services/batch_ingest.py
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal, get_engine
+from app.models.sales import ReportRun
+from app.services.report_progress import ReportRunProgress, publish_status
+from app.services.sales_ingest import SalesIngestService, StagedReport
+from app.services.sales_summary import invalidate_sales_cache
+from app.services.uploads import create_manual_report_run
+
+log = logging.getLogger(__name__)
+
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+# (имя для сводки, путь на диске или file-like)
+BatchSource = tuple[str, str | Path | BinaryIO]
+
+
+@dataclass
+class SheetJob:
+    report_run_id: int
+    path: str
+    file: str  # имя для сводки; у файла из ZIP -- "archive.zip/2024-01.xlsx"
+    sheet: str
+    store_id: int | None
+
+
+def _set_status(db: Session, report_run_ids: list[int], status: str, error: str | None = None) -> None:
+    if not report_run_ids:
+        return
+    values = {"status": status}
+    if error is not None:
+        values["last_error"] = error
+    db.execute(update(ReportRun).where(ReportRun.id.in_(report_run_ids)).values(**values))
+    db.commit()
+    for rr_id in report_run_ids:
+        publish_status(rr_id, status)
+
+
+def _stage_sheet(job: SheetJob) -> tuple[StagedReport | None, str | None]:
+    """Воркер (отдельный процесс): raw одного листа в БД, группы sales_fact -- обратно родителю."""
+    db = SessionLocal(bind=get_engine())
+    try:
+        _set_status(db, [job.report_run_id], "INGESTING")
+        staged = SalesIngestService().stage_report(
+            db,
+            job.report_run_id,
+            job.path,
+            store_id=job.store_id,
+            sheet_name=job.sheet,
+            on_progress=ReportRunProgress(job.report_run_id),
+        )
+        db.commit()
+        return staged, None
+    except Exception as e:
+        db.rollback()
+        log.exception("batch: лист %r из %s не загружен", job.sheet, job.file)
+        return None, f"{type(e).__name__}: {e}"
+    finally:
+        db.close()
+
+
+def _is_excel_member(m: zipfile.ZipInfo) -> bool:
+    p = PurePosixPath(m.filename)
+    return (
+        not m.is_dir()
+        and p.suffix.lower() in EXCEL_SUFFIXES
+        and not p.name.startswith(("~$", "."))  # lock-файлы Excel, мусор macOS
+        and "__MACOSX" not in p.parts
+    )
+
+
+class BatchIngestService:
+    """
+    Пакетный ingest: несколько xlsx и/или ZIP с xlsx, каждый лист каждой книги -- свой ReportRun.
+    1) ZIP раскрываются во временный каталог (только .xlsx/.xlsm, с лимитом на распакованный объём)
+    2) листы разбираются параллельно в процессах (batch_ingest_workers): raw_sales_rows + группы в памяти
+    3) группы всех листов сводятся и пишутся в sales_fact ОДИН раз под ReportRun пакета:
+       дельта, changelog, sku_registry, sku_sales_daily и инвалидация кеша -- один проход, а не N
+    Одна группа в нескольких листах: побеждает более поздний лист (порядок файлов, затем листов) --
+    как если бы те же файлы грузили через /sales/ingest по очереди.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ingest(self, files: list[BatchSource], store_id: int | None = None, workers: int | None = None) -> dict:
+        workers = workers or settings.batch_ingest_workers
+        batch = create_manual_report_run(self.db, label=f"batch:{uuid.uuid4().hex[:12]}", store_id=store_id)
+        _set_status(self.db, [batch.id], "INGESTING")
+        emitter = ReportRunProgress(batch.id)
+
+        Path(settings.upload_dir).mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="batch-", dir=settings.upload_dir) as tmp:
+            try:
+                workbooks = self._expand(files, Path(tmp))
+            except Exception as e:
+                _set_status(self.db, [batch.id], "FAILED", f"{type(e).__name__}: {e}")
+                raise
+
+            sheets: list[dict] = []
+            jobs: list[SheetJob] = []
+            try:
+                for name, path in workbooks:
+                    try:
+                        names = SalesIngestService.sheet_names(path)
+                    except Exception as e:
+                        sheets.append({"file": name, "sheet": None, "report_run_id": None, "status": "FAILED",
+                                       "error": f"{type(e).__name__}: {e}"})
+                        continue
+                    for sheet in names:
+                        rr = create_manual_report_run(self.db, label=f"{batch.report_id}/{len(jobs) + 1}", store_id=store_id)
+                        jobs.append(SheetJob(rr.id, str(path), name, sheet, store_id))
+
+                results = self._stage_all(jobs, workers, emitter)
+            except Exception as e:
+                # иначе пакет навсегда INGESTING, а листы -- CREATED
+                self.db.rollback()
+                log.exception("batch %s: разбор листов не удался", batch.id)
+                _set_status(self.db, [batch.id] + [j.report_run_id for j in jobs], "FAILED", f"{type(e).__name__}: {e}")
+                raise
+
+        staged: list[StagedReport] = []
+        for job, (st, error) in zip(jobs, results):
+            entry = {"file": job.file, "sheet": job.sheet, "report_run_id": job.report_run_id}
+            if st is None:
+                _set_status(self.db, [job.report_run_id], "FAILED", error)
+                entry.update(status="FAILED", error=error)
+            else:
+                staged.append(st)
+                entry.update(
+                    status="INGESTED",
+                    raw_in_file=st.raw_in_file,
+                    raw_inserted=st.raw_inserted,
+                    fact_groups=st.fact_groups,
+                    store_resolve=st.store_resolve,
+                )
+            sheets.append(entry)
+
+        facts: dict[str, dict] = {}
+        sku_rows: dict[str, dict] = {}
+        for st in staged:  # в порядке jobs: более поздний лист перезаписывает группу
+            facts.update(st.facts)
+            sku_rows.update((r["sku"], r) for r in st.sku_rows)
+
+        ok_ids = [st.report_run_id for st in staged]
+        try:
+            result, delta = SalesIngestService().apply_facts(
+                self.db, batch.id, facts, list(sku_rows.values()), store_id=store_id, on_progress=emitter
+            )
+            status = "INGESTED" if staged else "FAILED"
+            self.db.execute(
+                update(ReportRun)
+                .where(ReportRun.id.in_(ok_ids + [batch.id]))
+                .values(status=status, last_error=None if staged else "ни один лист не загружен")
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            log.exception("batch %s: запись sales_fact не удалась", batch.id)
+            _set_status(self.db, ok_ids + [batch.id], "FAILED", f"{type(e).__name__}: {e}")
+            raise
+        for rr_id in ok_ids + [batch.id]:
+            publish_status(rr_id, status)
+
+        cache_invalidated = invalidate_sales_cache(delta.changed + delta.removed)
+        raw_in_file = sum(st.raw_in_file for st in staged)
+        emitter("done", raw_in_file, raw_in_file)
+
+        return {
+            "report_run_id": int(batch.id),
+            "status": status,
+            "files": len(workbooks),
+            "sheets_total": len(sheets),
+            "sheets_ingested": len(staged),
+            "sheets_failed": len(sheets) - len(staged),
+            "raw_in_file": raw_in_file,
+            "raw_inserted": sum(st.raw_inserted for st in staged),
+            "fact_groups": len(facts),
+            **result,
+            "cache_invalidated": int(cache_invalidated),
+            "sheets": sheets,
+        }
+
+    @staticmethod
+    def _stage_all(
+        jobs: list[SheetJob], workers: int, emitter: ReportRunProgress
+    ) -> list[tuple[StagedReport | None, str | None]]:
+        results: list[tuple[StagedReport | None, str | None]] = [(None, None)] * len(jobs)
+        if workers <= 1 or len(jobs) <= 1:
+            for i, job in enumerate(jobs):
+                results[i] = _stage_sheet(job)
+                emitter("sheets", i + 1, len(jobs))
+            return results
+
+        # разбор xlsx упирается в CPU (GIL) -> процессы, а не потоки.
+        # spawn: у воркера свой engine и пул, унаследованные через fork соединения не делим
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as pool:
+            futures = {pool.submit(_stage_sheet, job): i for i, job in enumerate(jobs)}
+            for done, fut in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[fut]] = fut.result()
+                except Exception as e:  # упал сам процесс воркера (BrokenProcessPool и т.п.)
+                    results[futures[fut]] = (None, f"{type(e).__name__}: {e}")
+                emitter("sheets", done, len(jobs))
+        return results
+
+    @staticmethod
+    def _expand(files: list[BatchSource], workdir: Path) -> list[tuple[str, Path]]:
+        """file-like -> на диск (воркерам нужен путь), ZIP -> вложенные xlsx по порядку имён."""
+        out: list[tuple[str, Path]] = []
+        budget = settings.batch_ingest_max_unzipped_bytes
+        for i, (name, src) in enumerate(files):
+            if isinstance(src, (str, Path)):
+                path = Path(src)
+            else:
+                path = workdir / f"upload-{i}"
+                with open(path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+            # xlsx -- тоже zip-архив, поэтому архив пакета определяем по имени
+            if PurePosixPath(name).suffix.lower() != ".zip":
+                out.append((name, path))
+                continue
+
+            with zipfile.ZipFile(path) as zf:
+                members = sorted((m for m in zf.infolist() if _is_excel_member(m)), key=lambda m: m.filename)
+                budget -= sum(m.file_size for m in members)
+                if budget < 0:
+                    raise ValueError(f"{name}: распакованный объём больше {settings.batch_ingest_max_unzipped_bytes} байт")
+                for m in members:
+                    # имя из архива в путь не попадает (zip slip)
+                    target = workdir / f"{len(out)}{PurePosixPath(m.filename).suffix.lower()}"
+                    with zf.open(m) as zsrc, open(target, "wb") as dst:
+                        shutil.copyfileobj(zsrc, dst, 1024 * 1024)
+                    out.append((f"{name}/{m.filename}", target))
+        return out
@@ -0,0 +1,65 @@
+# app/services/dimensions.py
+
+from __future__ import annotations
+
+import threading
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.db import get_engine
+from app.models.dims import DimPartner, DimRegion, DimStoreName
+
+
+class DimensionCache:
+    """
+    name <-> id одной dim-таблицы, общий на процесс.
+    Новые имена дописываются отдельной короткой транзакцией (INSERT .. ON CONFLICT DO NOTHING) и сразу
+    коммитятся: откат ingest не оставит в кеше id, которого нет в БД. Словари маленькие (сотни-тысячи
+    имён) и только растут, поэтому без вытеснения.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._ids: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def ids_for(self, names: Iterable[str | None]) -> dict[str, int]:
+        wanted = {n for n in names if n}
+        with self._lock:
+            missing = wanted - self._ids.keys()
+        if missing:
+            self._load(missing, create=True)
+        with self._lock:
+            return {n: self._ids[n] for n in wanted}
+
+    def names_for(self, ids: Iterable[int | None]) -> dict[int, str]:
+        wanted = {int(i) for i in ids if i is not None}
+        with self._lock:
+            missing = wanted - self._names.keys()
+        if missing:
+            self._load(missing, create=False)  # id завели другим процессом
+        with self._lock:
+            return {i: self._names[i] for i in wanted if i in self._names}
+
+    def _load(self, keys: set, create: bool) -> None:
+        m = self.model
+        with get_engine().begin() as conn:
+            if create:
+                conn.execute(
+                    pg_insert(m).values([{"name": n} for n in sorted(keys)])
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+            col = m.name if create else m.id
+            rows = conn.execute(select(m.id, m.name).where(col.in_(keys))).all()
+        with self._lock:
+            for row_id, name in rows:
+                self._ids[name] = row_id
+                self._names[row_id] = name
+
+
+store_names = DimensionCache(DimStoreName)
+regions = DimensionCache(DimRegion)
+partners = DimensionCache(DimPartner)
@@ -0,0 +1,126 @@
+# app/services/report_progress.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, get_async_engine, get_engine
+from app.core.events import broker
+from app.models.sales import ReportRun
+
+log = logging.getLogger(__name__)
+
+
+def report_run_topic(report_run_id: int) -> str:
+    return f"report_run:{report_run_id}"
+
+
+class ReportRunProgress:
+    """
+    on_progress для SalesIngestService: события прогресса ReportRun.
+    - вызывается на границах партий (не на каждой строке)
+    - события одной стадии схлопываются: наружу не чаще progress_min_interval_sec,
+      но первое и последнее событие каждой стадии уходят всегда
+    - каждое отправленное событие: в broker (SSE) + снимок в report_runs.progress
+      (отдельная короткая транзакция -- основная сессия ingest держит свою)
+    """
+
+    def __init__(self, report_run_id: int):
+        self.report_run_id = report_run_id
+        self.topic = report_run_topic(report_run_id)
+        self.min_interval = settings.progress_min_interval_sec
+        self._stage: str | None = None
+        self._last = 0.0
+        self._pending: dict | None = None
+
+    def __call__(self, stage: str, done: int, total: int) -> None:
+        now = time.monotonic()
+        stage_changed = stage != self._stage
+        if stage_changed:
+            self.flush()  # последнее значение предыдущей стадии
+
+        self._pending = {"type": "progress", "stage": stage, "done": int(done), "total": int(total), "ts": time.time()}
+        self._stage = stage
+        if stage_changed or stage == "done" or now - self._last >= self.min_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        event, self._pending = self._pending, None
+        if event is None:
+            return
+        self._last = time.monotonic()
+        broker.publish(self.topic, event)
+        try:
+            with get_engine().begin() as conn:
+                conn.execute(update(ReportRun).where(ReportRun.id == self.report_run_id).values(progress=event))
+        except Exception:
+            # прогресс -- не повод ронять ingest
+            log.exception("ReportRun %s: не удалось сохранить прогресс", self.report_run_id)
+
+
+def publish_status(report_run_id: int, status: str) -> None:
+    broker.publish(report_run_topic(report_run_id), {"type": "status", "status": status, "ts": time.time()})
+
+
+# ---------- SSE ----------
+
+FINAL_STATUSES = ("INGESTED", "FAILED")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _snapshot(report_run_id: int) -> tuple[str | None, dict | None]:
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        row = (
+            await db.execute(
+                select(ReportRun.status, ReportRun.progress).where(ReportRun.id == report_run_id)
+            )
+        ).one_or_none()
+    return (row.status, row.progress) if row else (None, None)
+
+
+async def report_run_event_stream(report_run_id: int) -> AsyncIterator[str]:
+    """
+    Server-Sent Events по ReportRun: снимок из БД, дальше -- живые события из broker.
+    Если ingest идёт на другой реплике, событий здесь не будет -- тогда раз в
+    progress_sse_fallback_sec сверяемся со снимком report_runs.progress (PK lookup).
+    """
+    topic = report_run_topic(report_run_id)
+    q = broker.subscribe(topic)  # подписка ДО снимка, чтобы не потерять события между ними
+    try:
+        status, progress = await _snapshot(report_run_id)
+        yield _sse("status", {"type": "status", "status": status})
+        if progress:
+            yield _sse("progress", progress)
+        if status in FINAL_STATUSES:
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(q.get(), timeout=settings.progress_sse_fallback_sec)
+            except asyncio.TimeoutError:
+                new_status, new_progress = await _snapshot(report_run_id)
+                if new_progress != progress and new_progress:
+                    yield _sse("progress", new_progress)
+                if new_status != status:
+                    yield _sse("status", {"type": "status", "status": new_status})
+                status, progress = new_status, new_progress
+                if status in FINAL_STATUSES:
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            yield _sse(event["type"], event)
+            if event["type"] == "status" and event["status"] in FINAL_STATUSES:
+                return
+    finally:
+        broker.unsubscribe(topic, q)
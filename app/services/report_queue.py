@@ -0,0 +1,233 @@
+# app/services/report_queue.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal, get_engine
+from app.models.sales import ReportRun
+from app.services.report_progress import publish_status
+from app.services.sales_pipeline import SalesPipelineService
+
+log = logging.getLogger(__name__)
+
+# статусы, в которых run уже не обрабатывается
+FINAL_STATUSES = ("INGESTED", "FAILED")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+class ReportRunQueue:
+    """
+    Очередь report_runs с lease:
+    - enqueue: ReportRun(status=QUEUED, report_id=NULL)
+    - claim: SELECT ... FOR UPDATE SKIP LOCKED -- QUEUED или чужой протухший lease
+    - heartbeat продлевает lease, пока воркер жив
+    - после max_attempts run уходит в FAILED
+    """
+
+    def __init__(self, db: Session, worker_id: str | None = None):
+        self.db = db
+        self.worker_id = worker_id or default_worker_id()
+
+    def _lease_until(self):
+        return func.now() + timedelta(seconds=settings.queue_lease_sec)
+
+    def enqueue(self, type_id: int, date_from: date, date_to: date, store_id: int | None = None) -> ReportRun:
+        rr = ReportRun(
+            store_id=store_id,
+            report_id=None,
+            type_id=type_id,
+            date_from=date_from,
+            date_to=date_to,
+            status="QUEUED",
+        )
+        self.db.add(rr)
+        self.db.commit()
+        self.db.refresh(rr)
+        return rr
+
+    def _fail_exhausted(self) -> None:
+        # протухшие lease без оставшихся попыток -- в FAILED, иначе висят в промежуточном статусе
+        self.db.execute(
+            update(ReportRun)
+            .where(
+                ReportRun.attempts >= settings.queue_max_attempts,
+                ReportRun.lease_owner.is_not(None),
+                ReportRun.lease_expires_at < func.now(),
+                ReportRun.status.not_in(FINAL_STATUSES),
+            )
+            .values(status="FAILED", lease_owner=None, lease_expires_at=None, last_error="lease expired")
+        )
+        self.db.commit()
+
+    def claim(self) -> ReportRun | None:
+        self._fail_exhausted()
+        q = (
+            select(ReportRun)
+            .where(
+                ReportRun.attempts < settings.queue_max_attempts,
+                or_(
+                    # QUEUED остаётся и после claim (статус меняет пайплайн) -- без своего lease
+                    and_(
+                        ReportRun.status == "QUEUED",
+                        or_(ReportRun.lease_owner.is_(None), ReportRun.lease_expires_at < func.now()),
+                    ),
+                    # упавший/зависший воркер: lease истёк, run не дошёл до финала
+                    and_(
+                        ReportRun.lease_owner.is_not(None),
+                        ReportRun.lease_expires_at < func.now(),
+                        ReportRun.status.not_in(FINAL_STATUSES),
+                    ),
+                ),
+            )
+            .order_by(ReportRun.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        rr = self.db.execute(q).scalar_one_or_none()
+        if rr is None:
+            self.db.rollback()
+            return None
+
+        rr.lease_owner = self.worker_id
+        rr.lease_expires_at = self._lease_until()
+        rr.heartbeat_at = func.now()
+        rr.attempts = ReportRun.attempts + 1
+        self.db.commit()
+        self.db.refresh(rr)
+        return rr
+
+    def heartbeat(self, report_run_id: int) -> None:
+        # отдельная короткая транзакция: сессия пайплайна может быть посреди ingest
+        with self.db.get_bind().begin() as conn:
+            res = conn.execute(
+                update(ReportRun)
+                .where(ReportRun.id == report_run_id, ReportRun.lease_owner == self.worker_id)
+                .values(heartbeat_at=func.now(), lease_expires_at=self._lease_until())
+            )
+        if not res.rowcount:
+            raise LeaseLost(f"ReportRun {report_run_id}: lease потерян ({self.worker_id})")
+
+    def fence(self, report_run_id: int) -> None:
+        """
+        Перед каждой записью статуса и перед commit данных ingest: lease всё ещё наш. Строка остаётся
+        под FOR UPDATE до commit вызывающего -- claim другого воркера (SKIP LOCKED) не перехватит её
+        между проверкой и записью.
+        """
+        owner = self.db.execute(
+            select(ReportRun.lease_owner).where(ReportRun.id == report_run_id).with_for_update()
+        ).scalar_one_or_none()
+        if owner != self.worker_id:
+            raise LeaseLost(f"ReportRun {report_run_id}: lease потерян ({self.worker_id})")
+
+    def release(self, rr: ReportRun, error: str | None = None) -> None:
+        try:
+            self.fence(rr.id)
+        except LeaseLost:
+            # run уже у другого воркера: его lease и статус не трогаем
+            self.db.rollback()
+            log.error("ReportRun %s: lease потерян, release пропущен", rr.id)
+            return
+        if error is not None:
+            rr.last_error = error
+            rr.status = "FAILED" if rr.attempts >= settings.queue_max_attempts else "QUEUED"
+        rr.lease_owner = None
+        rr.lease_expires_at = None
+        self.db.commit()
+        if error is not None:
+            publish_status(rr.id, rr.status)
+
+    def process_one(self) -> dict | None:
+        rr = self.claim()
+        if rr is None:
+            return None
+
+        stop = threading.Event()
+        lost = threading.Event()
+        hb = threading.Thread(target=self._heartbeat_loop, args=(rr.id, stop, lost), daemon=True)
+        hb.start()
+
+        def fence() -> None:
+            if lost.is_set():
+                raise LeaseLost(f"ReportRun {rr.id}: lease перехвачен другим воркером")
+            self.fence(rr.id)
+
+        try:
+            result = SalesPipelineService(self.db).process_run(
+                rr, poll_sec=settings.sync_poll_sec, timeout_sec=settings.sync_timeout_sec, fence=fence
+            )
+        except LeaseLost as e:
+            # run обрабатывает другой воркер -- дальше не пишем ничего
+            self.db.rollback()
+            log.error("%s", e)
+            return {"report_run_id": rr.id, "status": "LEASE_LOST", "error": str(e)}
+        except Exception as e:
+            self.db.rollback()
+            log.exception("ReportRun %s failed (attempt %s)", rr.id, rr.attempts)
+            self.release(rr, error=f"{type(e).__name__}: {e}")
+            return {"report_run_id": rr.id, "status": rr.status, "error": rr.last_error}
+        finally:
+            stop.set()
+            hb.join()
+
+        self.release(rr)
+        return result
+
+    def _heartbeat_loop(self, report_run_id: int, stop: threading.Event, lost: threading.Event) -> None:
+        interval = max(1, settings.queue_lease_sec // 3)
+        while not stop.wait(interval):
+            try:
+                self.heartbeat(report_run_id)
+            except LeaseLost:
+                log.error("ReportRun %s: lease перехвачен другим воркером", report_run_id)
+                lost.set()  # пайплайн остановится на следующей записи статуса (fence)
+                return
+            except Exception:
+                log.exception("ReportRun %s: heartbeat failed", report_run_id)
+
+
+def _drain(worker_id: str) -> int:
+    db = SessionLocal(bind=get_engine())
+    try:
+        queue = ReportRunQueue(db, worker_id=worker_id)
+        done = 0
+        while (result := queue.process_one()) is not None:
+            done += 1
+            if "error" in result:
+                break  # не ретраим упавший run сразу же -- до следующего тика
+        return done
+    finally:
+        db.close()
+
+
+async def run_queue_forever(worker_id: str | None = None) -> None:
+    """
+    Цикл воркера очереди: разбирает всё доступное, потом спит queue_poll_sec.
+    Масштабируется количеством процессов/реплик -- SKIP LOCKED не даёт взять один run дважды.
+    """
+    worker_id = worker_id or default_worker_id()
+    while True:
+        try:
+            done = await asyncio.to_thread(_drain, worker_id)
+            if done:
+                log.info("queue worker %s: processed %s runs", worker_id, done)
+        except Exception:
+            log.exception("queue worker %s failed", worker_id)
+        await asyncio.sleep(settings.queue_poll_sec)
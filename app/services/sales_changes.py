@@ -0,0 +1,90 @@
+# app/services/sales_changes.py
+
+from __future__ import annotations
+
+import json
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.db import AsyncSessionLocal, get_async_engine
+from app.models.sales import SalesFact, sales_fact_change_seq
+
+# ключ pg_advisory_xact_lock для записи в sales_fact (SYNC_LOCK_KEY -- другой)
+SALES_FACT_WRITE_LOCK_KEY = 0x5A1E_FAC7
+
+
+def lock_sales_fact_writes(db: Session) -> None:
+    """
+    Сериализует транзакции, которые двигают change_seq.
+    nextval выдаётся вне транзакций: без блокировки параллельный ingest мог бы закоммитить seq=90
+    уже после того, как потребитель прочитал seq=100 и ушёл с after=100 -- изменение потерялось бы.
+    Под блокировкой номера выдаются в порядке коммитов. Повторный вызов в той же транзакции -- no-op.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(SALES_FACT_WRITE_LOCK_KEY)))
+
+
+def next_change_seq():
+    return sales_fact_change_seq.next_value()
+
+
+FEED_COLUMNS = (
+    SalesFact.change_seq,
+    SalesFact.id,
+    SalesFact.group_key,
+    SalesFact.store_id,
+    SalesFact.store_name,
+    SalesFact.sale_date,
+    SalesFact.application_id,
+    SalesFact.sku,
+    SalesFact.product_name_snapshot,
+    SalesFact.qty,
+    SalesFact.price,
+    SalesFact.total,
+    SalesFact.invoice,
+    SalesFact.return_type,
+    SalesFact.status,
+)
+
+
+def _line(row) -> str:
+    d = row._asdict()
+    for k in ("price", "total"):
+        if d[k] is not None:
+            d[k] = float(d[k])
+    return json.dumps(d, ensure_ascii=False, default=str) + "\n"
+
+
+class SalesChangeFeed:
+    """
+    Change-data feed по sales_fact: строки с change_seq > after в порядке change_seq.
+    - keyset по ux_sales_fact_change_seq: цена страницы не зависит от того, как далеко курсор
+    - строка отдаётся в текущем состоянии (removed -- status="removed", qty=0)
+    - потребитель продолжает с after = change_seq последней полученной строки;
+      пустой ответ -- догнали
+    """
+
+    PAGE_SIZE = 1000
+    MAX_LIMIT = 10000
+
+    async def stream(self, after: int, limit: int) -> AsyncIterator[str]:
+        # своя сессия: зависимость роута закрывается до начала отдачи тела
+        left = min(limit, self.MAX_LIMIT)
+        async with AsyncSessionLocal(bind=get_async_engine()) as db:
+            while left > 0:
+                rows = (
+                    await db.execute(
+                        select(*FEED_COLUMNS)
+                        .where(SalesFact.change_seq > after)
+                        .order_by(SalesFact.change_seq)
+                        .limit(min(left, self.PAGE_SIZE))
+                    )
+                ).all()
+                if not rows:
+                    return
+                yield "".join(_line(r) for r in rows)
+                after = rows[-1].change_seq
+                left -= len(rows)
+                if len(rows) < self.PAGE_SIZE:
+                    return
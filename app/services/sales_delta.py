@@ -0,0 +1,228 @@
+# app/services/sales_delta.py
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.sales import SalesFact, SalesFactChange
+from app.services.sales_changes import lock_sales_fact_writes, next_change_seq
+
+# колонки uq_sales_fact_group -- ключ группы
+GROUP_KEY_COLS = ("store_id", "sale_date", "application_id", "sku", "price", "total", "invoice", "return_type")
+# что может поменяться у группы между отчётами
+ROW_HASH_COLS = ("qty", "status", "product_name_snapshot", "store_name")
+
+REMOVED_STATUS = "removed"
+
+_CENT = Decimal("0.01")
+
+
+def _fmt(v: Any) -> str:
+    # канон совпадает с ::text в PostgreSQL (см. миграцию с backfill group_key/row_hash);
+    # numeric(18,2) в PG округляет половину от нуля (10.125 -> 10.13), а не к чётному
+    if v is None or v != v:  # NaN из pandas уходит в БД как NULL
+        return "\\N"
+    if isinstance(v, float):  # в т.ч. numpy.float64
+        return str(Decimal(repr(float(v))).quantize(_CENT, rounding=ROUND_HALF_UP))
+    if isinstance(v, Decimal):
+        return str(v.quantize(_CENT, rounding=ROUND_HALF_UP))
+    if isinstance(v, datetime):  # pd.Timestamp -> sale_date::text
+        return v.date().isoformat()
+    return str(v)
+
+
+def _md5(values) -> str:
+    return hashlib.md5("|".join(_fmt(v) for v in values).encode("utf-8")).hexdigest()
+
+
+def group_key(row: dict) -> str:
+    return _md5(row[c] for c in GROUP_KEY_COLS)
+
+
+def row_hash(row: dict) -> str:
+    return _md5(row[c] for c in ROW_HASH_COLS)
+
+
+@dataclass
+class SalesFactDelta:
+    changed: list[dict] = field(default_factory=list)   # новые + изменённые группы -> upsert
+    removed: list[dict] = field(default_factory=list)   # были в периоде, в новом отчёте нет
+    changes: list[dict] = field(default_factory=list)   # строки changelog
+    unchanged: int = 0
+
+    def counts(self) -> dict:
+        out = {"added": 0, "removed": 0, "qty_changed": 0, "status_changed": 0}
+        for c in self.changes:
+            out[c["change_type"]] += 1
+        out["unchanged"] = self.unchanged
+        return out
+
+
+class SalesDeltaEngine:
+    """
+    Дельта нового отчёта против sales_fact по хешу группы:
+    - group_key = md5(колонки uq_sales_fact_group), row_hash = md5(qty, status, название, магазин)
+    - совпал row_hash -> группу не пишем вовсе
+    - period задан (отчёт Alif за [date_from..date_to]) -> группы периода, которых нет в отчёте,
+      помечаются removed (qty=0), а не удаляются: потребители видят это как изменение
+    - всё, что поменялось, пишется в sales_fact_changes
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def diff(
+        self,
+        fact_rows: list[dict],
+        report_run_id: int,
+        period: tuple[date, date] | None = None,
+        store_id: int | None = None,
+    ) -> SalesFactDelta:
+        return self.diff_keyed(self.keyed(fact_rows), report_run_id=report_run_id, period=period, store_id=store_id)
+
+    def diff_keyed(
+        self,
+        new: dict[str, dict],
+        report_run_id: int,
+        period: tuple[date, date] | None = None,
+        store_id: int | None = None,
+    ) -> SalesFactDelta:
+        """diff по уже посчитанным keyed(): group_key -> строка с group_key/row_hash."""
+        existing = self._load_existing(list(new))
+
+        delta = SalesFactDelta()
+        for key, row in new.items():
+            old = existing.get(key)
+            if old is None:
+                delta.changed.append(row)
+                delta.changes.append(self._change(report_run_id, key, "added", None, row))
+                continue
+            if old.row_hash == row["row_hash"]:
+                delta.unchanged += 1
+                continue
+
+            delta.changed.append(row)
+            if old.status != row["status"]:
+                delta.changes.append(self._change(report_run_id, key, "status_changed", old, row))
+            elif old.qty != row["qty"]:
+                delta.changes.append(self._change(report_run_id, key, "qty_changed", old, row))
+
+        removal_period = self._removal_period(period, new.values())
+        if removal_period is not None:
+            for old in self._load_period(removal_period, store_id, exclude=new.keys()):
+                gone = {"qty": 0, "status": REMOVED_STATUS}
+                delta.removed.append(
+                    {
+                        "id": old.id,
+                        "group_key": old.group_key,
+                        "store_id": old.store_id,
+                        "sku": old.sku,
+                        "sale_date": old.sale_date,
+                    }
+                )
+                delta.changes.append(self._change(report_run_id, old.group_key, "removed", old, gone))
+        return delta
+
+    def apply_removed(self, delta: SalesFactDelta) -> int:
+        if not delta.removed:
+            return 0
+        # название и магазин обнуляем вместе с qty: row_hash должен совпадать с тем, что лежит в строке
+        rh = row_hash({"qty": 0, "status": REMOVED_STATUS, "product_name_snapshot": None, "store_name": None})
+        ids = [r["id"] for r in delta.removed]
+        size = settings.ingest_batch_max_rows
+        lock_sales_fact_writes(self.db)
+        for start in range(0, len(ids), size):
+            self.db.execute(
+                update(SalesFact)
+                .where(SalesFact.id.in_(ids[start:start + size]))
+                .values(
+                    qty=0,
+                    status=REMOVED_STATUS,
+                    product_name_snapshot=None,
+                    store_name=None,
+                    row_hash=rh,
+                    change_seq=next_change_seq(),
+                )
+            )
+        return len(delta.removed)
+
+    def write_changelog(self, delta: SalesFactDelta) -> int:
+        if not delta.changes:
+            return 0
+        size = settings.ingest_batch_max_rows
+        for start in range(0, len(delta.changes), size):
+            self.db.execute(insert(SalesFactChange), delta.changes[start:start + size])
+        return len(delta.changes)
+
+    def keyed(self, fact_rows: list[dict]) -> dict[str, dict]:
+        """group_key -> строка (+ group_key, row_hash); store_id должен быть уже проставлен."""
+        out: dict[str, dict] = {}
+        for r in fact_rows:
+            key = group_key(r)
+            prev = out.get(key)
+            if prev is not None:
+                # одна группа uq_sales_fact_group из разных store_name -- иначе ON CONFLICT
+                # "cannot affect row a second time"
+                r = {**r, "qty": prev["qty"] + r["qty"]}
+            out[key] = {**r, "group_key": key}
+        for r in out.values():
+            r["row_hash"] = row_hash(r)
+        return out
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def _removal_period(period: tuple[date, date] | None, rows) -> tuple[date, date] | None:
+        # removed считаем только внутри дат, реально присутствующих в отчёте: пустой отчёт
+        # не обнуляет период, а неточная граница date_to (включительно/нет) не даёт ложных removed
+        if period is None:
+            return None
+        dates = [r["sale_date"] for r in rows if r["sale_date"] is not None]
+        if not dates:
+            return None
+        start, end = max(period[0], min(dates)), min(period[1], max(dates))
+        return (start, end) if start <= end else None
+
+    def _load_existing(self, keys: list[str]) -> dict[str, Any]:
+        found = {}
+        size = settings.ingest_batch_max_rows
+        for start in range(0, len(keys), size):
+            rows = self.db.execute(
+                select(SalesFact.group_key, SalesFact.row_hash, SalesFact.qty, SalesFact.status)
+                .where(SalesFact.group_key.in_(keys[start:start + size]))
+            ).all()
+            found.update({r.group_key: r for r in rows})
+        return found
+
+    def _load_period(self, period: tuple[date, date], store_id: int | None, exclude) -> list[Any]:
+        q = select(
+            SalesFact.id, SalesFact.group_key, SalesFact.qty, SalesFact.status,
+            SalesFact.store_id, SalesFact.sku, SalesFact.sale_date,
+        ).where(
+            SalesFact.sale_date.between(period[0], period[1]),
+            SalesFact.status != REMOVED_STATUS,
+        )
+        if store_id is not None:
+            q = q.where(SalesFact.store_id == store_id)
+        exclude = set(exclude)
+        return [r for r in self.db.execute(q) if r.group_key not in exclude]
+
+    @staticmethod
+    def _change(report_run_id: int, key: str, change_type: str, old, new: dict) -> dict:
+        return {
+            "report_run_id": report_run_id,
+            "group_key": key,
+            "change_type": change_type,
+            "old_qty": None if old is None else old.qty,
+            "new_qty": new["qty"],
+            "old_status": None if old is None else old.status,
+            "new_status": new["status"],
+        }
@@ -0,0 +1,156 @@
+# app/services/sales_export.py
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from typing import AsyncIterator, Literal
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.core.db import AsyncSessionLocal, get_async_engine
+from app.models.dims import DimPartner, DimRegion, DimStoreName
+from app.models.sales import RawSalesRow, SalesFact
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+FACT_COLUMNS = (
+    SalesFact.id,
+    SalesFact.store_id,
+    SalesFact.store_name,
+    SalesFact.sale_date,
+    SalesFact.application_id,
+    SalesFact.sku,
+    SalesFact.product_name_snapshot,
+    SalesFact.qty,
+    SalesFact.price,
+    SalesFact.total,
+    SalesFact.invoice,
+    SalesFact.return_type,
+    SalesFact.status,
+    SalesFact.change_seq,
+)
+
+_district = aliased(DimRegion, name="district")
+
+# raw в исходном виде отчёта: ключи словарей (store_name_id, ...) раскрываем обратно в строки
+RAW_COLUMNS = (
+    RawSalesRow.id,
+    RawSalesRow.report_run_id,
+    RawSalesRow.source_row_no,
+    RawSalesRow.sale_date,
+    RawSalesRow.application_id,
+    RawSalesRow.client,
+    RawSalesRow.product_name,
+    RawSalesRow.price,
+    RawSalesRow.sku,
+    RawSalesRow.quantity,
+    RawSalesRow.total,
+    RawSalesRow.marking,
+    DimStoreName.name.label("store_name"),
+    DimRegion.name.label("region"),
+    _district.name.label("district"),
+    RawSalesRow.inn,
+    RawSalesRow.period,
+    RawSalesRow.first_payment_date,
+    RawSalesRow.approval_date,
+    DimPartner.name.label("partner_name"),
+    RawSalesRow.invoice,
+    RawSalesRow.return_type,
+)
+
+
+def _value(v):
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+class SalesExportService:
+    """
+    Потоковая выгрузка sales_fact / raw_sales_rows в NDJSON или CSV:
+    - один запрос WHERE id > after_id ORDER BY id: keyset, без OFFSET -- продолжение выгрузки
+      с after_id = id последней строки стоит столько же, сколько её начало
+    - server-side cursor (stream + yield_per): в памяти одна партия, первые байты уходят сразу
+    - фильтры по дате/магазину/SKU идут по индексам (ix_sales_fact_*, uq_sales_fact_group)
+    """
+
+    PARTITION_ROWS = 2000
+
+    async def facts(
+        self,
+        fmt: ExportFormat = "ndjson",
+        date_from: date | None = None,
+        date_to: date | None = None,
+        store_id: int | None = None,
+        sku: str | None = None,
+        after_id: int = 0,
+        limit: int | None = None,
+    ) -> AsyncIterator[str]:
+        q = select(*FACT_COLUMNS).where(SalesFact.id > after_id)
+        if date_from is not None:
+            q = q.where(SalesFact.sale_date >= date_from)
+        if date_to is not None:
+            q = q.where(SalesFact.sale_date <= date_to)
+        if store_id is not None:
+            q = q.where(SalesFact.store_id == store_id)
+        if sku is not None:
+            q = q.where(SalesFact.sku == sku)
+        q = q.order_by(SalesFact.id)
+        if limit is not None:
+            q = q.limit(limit)
+
+        async for chunk in self._stream(q, [c.name for c in FACT_COLUMNS], fmt):
+            yield chunk
+
+    async def raw(
+        self,
+        report_run_id: int,
+        fmt: ExportFormat = "ndjson",
+        after_id: int = 0,
+        limit: int | None = None,
+    ) -> AsyncIterator[str]:
+        q = (
+            select(*RAW_COLUMNS)
+            .outerjoin(DimStoreName, DimStoreName.id == RawSalesRow.store_name_id)
+            .outerjoin(DimRegion, DimRegion.id == RawSalesRow.region_id)
+            .outerjoin(_district, _district.id == RawSalesRow.district_id)
+            .outerjoin(DimPartner, DimPartner.id == RawSalesRow.partner_id)
+            .where(RawSalesRow.report_run_id == report_run_id, RawSalesRow.id > after_id)
+            .order_by(RawSalesRow.id)
+        )
+        if limit is not None:
+            q = q.limit(limit)
+
+        async for chunk in self._stream(q, [c.key for c in RAW_COLUMNS], fmt):
+            yield chunk
+
+    async def _stream(self, q, columns: list[str], fmt: ExportFormat) -> AsyncIterator[str]:
+        # своя сессия: зависимость роута закрывается до начала отдачи тела
+        async with AsyncSessionLocal(bind=get_async_engine()) as db:
+            if fmt == "csv":
+                yield self._csv([columns])
+
+            result = await db.stream(q.execution_options(yield_per=self.PARTITION_ROWS))
+            async for part in result.partitions():
+                if fmt == "csv":
+                    yield self._csv([[_value(v) for v in row] for row in part])
+                else:
+                    yield "".join(
+                        json.dumps(dict(zip(columns, map(_value, row))), ensure_ascii=False) + "\n"
+                        for row in part
+                    )
+
+    @staticmethod
+    def _csv(rows: list[list]) -> str:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(rows)
+        return buf.getvalue()
@@ -4,15 +4,29 @@ from __future__ import annotations
 
 import io
 import re
+from dataclasses import dataclass
 from datetime import date
-from typing import Any
+from pathlib import Path
+from typing import Any, BinaryIO, Callable
 
 import pandas as pd
-from sqlalchemy import select, func
+from sqlalchemy import Float, cast, or_, select, func
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.models.sales import RawSalesRow, SalesFact, SkuRegistry, SkuStatus
+from app.core.bulk import UpsertStats, chunked_upsert
+from app.core.config import settings
+from app.models.sales import RawSalesRow, SalesFact, SkuRegistry, SkuSalesDaily, SkuStatus
+from app.services import dimensions
+from app.services.report_progress import ReportRunProgress
+from app.services.sales_changes import lock_sales_fact_writes, next_change_seq
+from app.services.sales_delta import SalesDeltaEngine, SalesFactDelta
+from app.services.sales_summary import invalidate_sales_cache
+from app.services.sku_resolver import cached_resolution
+from app.services.store_resolver import StoreResolver
+
+# on_progress(stage, done, total): parsed / raw / facts / done
+ProgressCallback = Callable[[str, int, int], None]
 
 
 def _norm_sku(v: Any) -> str | None:
@@ -43,6 +57,14 @@ def _safe_int(v: Any) -> int | None:
         return None
 
 
+def _clean_str(v: Any, pool: dict[str, str]) -> str | None:
+    # pool -- интернирование: одинаковые значения колонки -> один объект str на весь отчёт
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return None
+    s = str(v).strip()
+    return pool.setdefault(s, s)
+
+
 def _safe_num(v: Any) -> float | None:
     if v is None or (isinstance(v, float) and pd.isna(v)):
         return None
@@ -53,13 +75,27 @@ def _safe_num(v: Any) -> float | None:
         return None
 
 
+@dataclass
+class StagedReport:
+    """Лист отчёта, разобранный до sales_fact: raw уже в БД, группы -- в памяти."""
+
+    report_run_id: int
+    raw_in_file: int
+    raw_inserted: int
+    fact_groups: int
+    store_resolve: dict
+    facts: dict[str, dict]  # group_key -> строка sales_fact (SalesDeltaEngine.keyed)
+    sku_rows: list[dict]
+
+
 class SalesIngestService:
     """
     Делает:
     1) читает merchants.xlsx (учитывая пустой 1й столбец)
     2) пишет raw_sales_rows (on_conflict_do_nothing)
-    3) аггрегирует raw -> sales_fact (qty = count)
+    3) аггрегирует raw -> sales_fact (qty = count); пишет только изменившиеся группы (SalesDeltaEngine)
     4) обновляет sku_registry (first/last seen)
+    5) пересчитывает sku_sales_daily для затронутых (sku, store_id, sale_date)
     """
 
     # ожидаемые колонки ПОСЛЕ первого столбца
@@ -85,42 +121,168 @@ class SalesIngestService:
         "return_type",
     ]
 
+    # размер партии при чтении raw из БД (server-side cursor)
+    RAW_LOAD_CHUNK = 10_000
+
     def ingest_excel_bytes(
         self,
         db: Session,
         report_run_id: int,
         excel_bytes: bytes,
         store_id: int | None = None,
+        on_progress: ProgressCallback | None = None,
+        period: tuple[date, date] | None = None,
+        fence: Callable[[], None] | None = None,
     ) -> dict:
-        df = self._read_excel(excel_bytes)
+        return self.ingest_excel(
+            db=db,
+            report_run_id=report_run_id,
+            source=io.BytesIO(excel_bytes),
+            store_id=store_id,
+            on_progress=on_progress,
+            period=period,
+            fence=fence,
+        )
+
+    def ingest_excel(
+        self,
+        db: Session,
+        report_run_id: int,
+        source: str | Path | BinaryIO,
+        store_id: int | None = None,
+        on_progress: ProgressCallback | None = None,
+        period: tuple[date, date] | None = None,
+        fence: Callable[[], None] | None = None,
+    ) -> dict:
+        """
+        То же, что ingest_excel_bytes, но из файла на диске (загрузки по частям) или file-like.
+        period -- отчёт полный за [date_from..date_to]: группы периода, которых в нём нет, станут removed.
+        fence() -- прямо перед commit данных (очередь: lease всё ещё наш, иначе исключение и rollback
+        вызывающим -- raw_sales_rows/sales_fact потерявшего lease воркера не коммитятся).
+        """
+        # прогресс всегда публикуется по ReportRun (SSE + report_runs.progress), плюс колбек вызывающего
+        emitter = ReportRunProgress(report_run_id)
+
+        def progress(stage: str, done: int, total: int) -> None:
+            emitter(stage, done, total)
+            if on_progress is not None:
+                on_progress(stage, done, total)
+
+        staged = self.stage_report(db, report_run_id, source, store_id=store_id, on_progress=progress)
+        result, delta = self.apply_facts(
+            db, report_run_id, staged.facts, staged.sku_rows, store_id=store_id, period=period, on_progress=progress
+        )
+
+        if fence is not None:
+            fence()
+        db.commit()
+        # кеш ответов: только месяцы/магазины, которые этот ReportRun реально поменял
+        cache_invalidated = invalidate_sales_cache(delta.changed + delta.removed)
+        progress("done", staged.raw_in_file, staged.raw_in_file)
+
+        return {
+            "report_run_id": int(report_run_id),
+            "raw_in_file": staged.raw_in_file,
+            "raw_inserted": staged.raw_inserted,
+            "fact_groups": staged.fact_groups,
+            "store_resolve": staged.store_resolve,
+            **result,
+            "cache_invalidated": int(cache_invalidated),
+        }
+
+    def stage_report(
+        self,
+        db: Session,
+        report_run_id: int,
+        source: str | Path | BinaryIO,
+        store_id: int | None = None,
+        sheet_name: str | int = 0,
+        on_progress: ProgressCallback | None = None,
+    ) -> StagedReport:
+        """
+        Первая половина ingest одного листа: raw_sales_rows + группы sales_fact в памяти
+        (store_id сопоставлен, group_key/row_hash посчитаны). sales_fact не трогает.
+        """
+        progress = on_progress or (lambda *_: None)
+
+        df = self._read_excel(source, sheet_name=sheet_name)
+        progress("parsed", len(df), len(df))
 
         raw_rows = self._build_raw_rows(report_run_id=report_run_id, df=df)
-        inserted_raw = self._insert_raw(db, raw_rows)
+        inserted_raw = self._insert_raw(
+            db, raw_rows, on_batch=lambda st: progress("raw", st.rows, len(raw_rows))
+        )
 
         # берем ВСЕ raw для этого report_run_id (включая уже существующие)
         raw_df = self._load_raw_df(db, report_run_id)
 
         fact_rows = self._build_fact_rows(raw_df, store_id=store_id)
-        upserted_fact = self._upsert_sales_fact(db, fact_rows)
-
-        sku_rows = self._build_sku_registry_rows(raw_df, store_id=store_id)
-        upserted_sku = self._upsert_sku_registry(db, sku_rows)
-
-        db.commit()
+        # store_name -> stores.id (отчёт MAIN-аккаунта приходит без store_id)
+        store_stats = StoreResolver(db).attach(fact_rows, report_run_id=report_run_id)
+
+        return StagedReport(
+            report_run_id=int(report_run_id),
+            raw_in_file=int(len(df)),
+            raw_inserted=int(inserted_raw),
+            fact_groups=int(len(fact_rows)),
+            store_resolve=store_stats,
+            facts=SalesDeltaEngine(db).keyed(fact_rows),
+            sku_rows=self._build_sku_registry_rows(raw_df, store_id=store_id),
+        )
 
-        return {
-            "report_run_id": int(report_run_id),
-            "raw_in_file": int(len(df)),
-            "raw_inserted": int(inserted_raw),
-            "fact_groups": int(len(fact_rows)),
-            "fact_upserted": int(upserted_fact),
-            "sku_upserted": int(upserted_sku),
+    def apply_facts(
+        self,
+        db: Session,
+        report_run_id: int,
+        facts: dict[str, dict],
+        sku_rows: list[dict],
+        store_id: int | None = None,
+        period: tuple[date, date] | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> tuple[dict, SalesFactDelta]:
+        """
+        Вторая половина ingest: дельта против sales_fact, upsert, changelog, sku_registry, sku_sales_daily.
+        Без commit -- его делает вызывающий (и после него invalidate_sales_cache по delta).
+        """
+        progress = on_progress or (lambda *_: None)
+
+        # дельта против sales_fact: пишем только новые/изменённые группы
+        delta_engine = SalesDeltaEngine(db)
+        delta = delta_engine.diff_keyed(facts, report_run_id=report_run_id, period=period, store_id=store_id)
+        fact_stats = self._upsert_sales_fact(
+            db, delta.changed, on_batch=lambda st: progress("facts", st.rows, len(delta.changed))
+        )
+        delta_engine.apply_removed(delta)
+        delta_engine.write_changelog(delta)
+
+        sku_stats = self._upsert_sku_registry(db, sku_rows)
+
+        progress("sku", len(sku_rows), len(sku_rows))
+        sku_daily = self._refresh_sku_sales_daily(db, delta.changed + delta.removed)
+
+        result = {
+            "fact_delta": delta.counts(),
+            "fact_upserted": int(fact_stats.affected),
+            "fact_inserted": int(fact_stats.inserted),
+            "fact_updated": int(fact_stats.updated),
+            "fact_batches": [vars(b) for b in fact_stats.batches],
+            "sku_upserted": int(sku_stats.affected),
+            "sku_inserted": int(sku_stats.inserted),
+            "sku_daily_refreshed": int(sku_daily),
         }
+        return result, delta
 
     # ---------- Excel ----------
 
-    def _read_excel(self, excel_bytes: bytes) -> pd.DataFrame:
-        df = pd.read_excel(io.BytesIO(excel_bytes), sheet_name=0)
+    @staticmethod
+    def sheet_names(source: str | Path | BinaryIO) -> list[str]:
+        with pd.ExcelFile(source) as xls:
+            return [str(name) for name in xls.sheet_names]
+
+    def _read_excel(self, source: str | Path | BinaryIO, sheet_name: str | int = 0) -> pd.DataFrame:
+        df = pd.read_excel(source, sheet_name=sheet_name)
+        if len(df.columns) == 0:
+            raise ValueError(f"Лист {sheet_name!r} пуст")
 
         # первый столбец в merchants.xlsx пустой по названию -> обычно "Unnamed: 0"
         # НЕ удаляем его, а используем как source_row_no
@@ -146,6 +308,7 @@ class SalesIngestService:
     # ---------- RAW ----------
 
     def _build_raw_rows(self, report_run_id: int, df: pd.DataFrame) -> list[dict]:
+        pool: dict[str, str] = {}
         rows: list[dict] = []
         for _, r in df.iterrows():
             rows.append(
@@ -157,7 +320,7 @@ class SalesIngestService:
                     "application_id": _safe_int(r.get("application_id")),
 
                     "client": (None if pd.isna(r.get("client")) else str(r.get("client")).strip()),
-                    "product_name": (None if pd.isna(r.get("product_name")) else str(r.get("product_name")).strip()),
+                    "product_name": _clean_str(r.get("product_name"), pool),
 
                     "price": _safe_num(r.get("price")),
                     "sku": _norm_sku(r.get("sku")),
@@ -165,55 +328,87 @@ class SalesIngestService:
                     "quantity": _safe_int(r.get("quantity")) or 1,
                     "total": _safe_num(r.get("total")),
 
-                    "marking": (None if pd.isna(r.get("marking")) else str(r.get("marking")).strip()),
-                    "store_name": (None if pd.isna(r.get("store_name")) else str(r.get("store_name")).strip()),
+                    "marking": _clean_str(r.get("marking"), pool),
+                    "store_name": _clean_str(r.get("store_name"), pool),
 
-                    "region": (None if pd.isna(r.get("region")) else str(r.get("region")).strip()),
-                    "district": (None if pd.isna(r.get("district")) else str(r.get("district")).strip()),
+                    "region": _clean_str(r.get("region"), pool),
+                    "district": _clean_str(r.get("district"), pool),
                     "inn": (None if pd.isna(r.get("inn")) else str(r.get("inn")).strip()),
 
                     "period": _safe_int(r.get("period")),
                     "first_payment_date": (None if pd.isna(r.get("first_payment_date")) else str(r.get("first_payment_date")).strip()),
                     "approval_date": (None if pd.isna(r.get("approval_date")) else str(r.get("approval_date")).strip()),
 
-                    "partner_name": (None if pd.isna(r.get("partner_name")) else str(r.get("partner_name")).strip()),
-                    "invoice": (None if pd.isna(r.get("invoice")) else str(r.get("invoice")).strip()),
-                    "return_type": (None if pd.isna(r.get("return_type")) else str(r.get("return_type")).strip()),
+                    "partner_name": _clean_str(r.get("partner_name"), pool),
+                    "invoice": _clean_str(r.get("invoice"), pool),
+                    "return_type": _clean_str(r.get("return_type"), pool),
                 }
             )
+        self._encode_dims(rows)
         return rows
 
-    def _insert_raw(self, db: Session, rows: list[dict]) -> int:
+    @staticmethod
+    def _encode_dims(rows: list[dict]) -> None:
+        """store_name/region/district/partner_name -> int-ключи словарей (по одному запросу на словарь)."""
+        store_ids = dimensions.store_names.ids_for(r["store_name"] for r in rows)
+        region_ids = dimensions.regions.ids_for([r["region"] for r in rows] + [r["district"] for r in rows])
+        partner_ids = dimensions.partners.ids_for(r["partner_name"] for r in rows)
+        for r in rows:
+            r["store_name_id"] = store_ids.get(r.pop("store_name"))
+            r["region_id"] = region_ids.get(r.pop("region"))
+            r["district_id"] = region_ids.get(r.pop("district"))
+            r["partner_id"] = partner_ids.get(r.pop("partner_name"))
+
+    def _insert_raw(self, db: Session, rows: list[dict], on_batch=None) -> int:
         if not rows:
             return 0
 
-        stmt = pg_insert(RawSalesRow).values(rows)
-        stmt = stmt.on_conflict_do_nothing(constraint="uq_raw_report_row")
+        def _stmt(chunk):
+            return pg_insert(RawSalesRow).values(chunk).on_conflict_do_nothing(constraint="uq_raw_report_row")
 
-        res = db.execute(stmt)
-        return res.rowcount or 0
+        stats = chunked_upsert(db, _stmt, rows, max_rows=settings.ingest_batch_max_rows, on_batch=on_batch)
+        return stats.inserted
+
+    # колонки raw, нужные для агрегации (client/region/inn и пр. не тянем)
+    RAW_AGG_COLS = [
+        "store_name_id",
+        "sale_date",
+        "application_id",
+        "sku",
+        "price",
+        "total",
+        "invoice",
+        "return_type",
+        "product_name",
+        "source_row_no",
+    ]
 
     def _load_raw_df(self, db: Session, report_run_id: int) -> pd.DataFrame:
-        q = select(RawSalesRow).where(RawSalesRow.report_run_id == report_run_id)
-        raw = db.execute(q).scalars().all()
+        # Core-select только нужных колонок: без ORM identity map и без Decimal -> float в цикле.
+        # numeric кастуем в float8 на стороне БД, psycopg сразу отдаёт float.
+        cols = []
+        for name in self.RAW_AGG_COLS:
+            col = RawSalesRow.__table__.c[name]
+            if name in ("price", "total"):
+                col = cast(col, Float).label(name)
+            cols.append(col)
+
+        q = (
+            select(*cols)
+            .where(RawSalesRow.report_run_id == report_run_id)
+            .execution_options(yield_per=self.RAW_LOAD_CHUNK)
+        )
+        res = db.execute(q)
 
-        data = []
-        for r in raw:
-            data.append(
-                {
-                    "store_name": r.store_name,
-                    "sale_date": r.sale_date,
-                    "application_id": r.application_id,
-                    "sku": r.sku,
-                    "price": float(r.price) if r.price is not None else None,
-                    "total": float(r.total) if r.total is not None else None,
-                    "invoice": r.invoice,
-                    "return_type": r.return_type,
-                    "product_name": r.product_name,
-                    "source_row_no": r.source_row_no,
-                }
-            )
-        return pd.DataFrame(data)
+        # server-side cursor: читаем партиями, DataFrame собираем один раз
+        rows: list[tuple] = []
+        for part in res.partitions():
+            rows.extend(part)
+
+        df = pd.DataFrame.from_records(rows, columns=self.RAW_AGG_COLS)
+        df["price"] = df["price"].astype("float64")
+        df["total"] = df["total"].astype("float64")
+        return df
 
     # ---------- FACT ----------
 
@@ -226,8 +421,9 @@ class SalesIngestService:
 
         raw_df["status"] = raw_df.apply(_status, axis=1)
 
+        # группируем по int-ключу названия магазина, строку подставляем уже в готовые группы
         group_cols = [
-            "store_name", "sale_date", "application_id", "sku", "price", "total", "invoice", "return_type", "status"
+            "store_name_id", "sale_date", "application_id", "sku", "price", "total", "invoice", "return_type", "status"
         ]
 
         g = (
@@ -240,12 +436,14 @@ class SalesIngestService:
             .reset_index()
         )
 
+        names = dimensions.store_names.names_for(g["store_name_id"].dropna().unique())
+
         rows: list[dict] = []
         for _, r in g.iterrows():
             rows.append(
                 {
                     "store_id": store_id,
-                    "store_name": None if pd.isna(r["store_name"]) else str(r["store_name"]),
+                    "store_name": None if pd.isna(r["store_name_id"]) else names[int(r["store_name_id"])],
                     "sale_date": None if pd.isna(r["sale_date"]) else r["sale_date"],
                     "application_id": None if pd.isna(r["application_id"]) else int(r["application_id"]),
                     "sku": None if pd.isna(r["sku"]) else str(r["sku"]),
@@ -260,23 +458,33 @@ class SalesIngestService:
             )
         return rows
 
-    def _upsert_sales_fact(self, db: Session, rows: list[dict]) -> int:
-        if not rows:
-            return 0
+    def _upsert_sales_fact(self, db: Session, rows: list[dict], on_batch=None) -> UpsertStats:
+        def _stmt(chunk):
+            # на каждую партию: при ingest_commit_between_batches транзакция (и блокировка) новая
+            lock_sales_fact_writes(db)
+            stmt = pg_insert(SalesFact).values(chunk)
+            return stmt.on_conflict_do_update(
+                index_elements=["group_key"],
+                set_={
+                    "qty": stmt.excluded.qty,  # идемпотентно
+                    "product_name_snapshot": stmt.excluded.product_name_snapshot,
+                    "store_name": stmt.excluded.store_name,
+                    "status": stmt.excluded.status,
+                    "row_hash": stmt.excluded.row_hash,
+                    "change_seq": next_change_seq(),  # insert берёт тот же nextval из server_default
+                },
+            )
 
-        stmt = pg_insert(SalesFact).values(rows)
-        stmt = stmt.on_conflict_do_update(
-            constraint="uq_sales_fact_group",
-            set_={
-                "qty": stmt.excluded.qty,  # идемпотентно
-                "product_name_snapshot": stmt.excluded.product_name_snapshot,
-                "status": stmt.excluded.status,
-            },
+        # партиями: не упираемся в 65535 bind-параметров и не держим блокировки на весь прогон
+        return chunked_upsert(
+            db,
+            _stmt,
+            rows,
+            max_rows=settings.ingest_batch_max_rows,
+            commit_between=settings.ingest_commit_between_batches,
+            on_batch=on_batch,
         )
 
-        res = db.execute(stmt)
-        return res.rowcount or 0
-
     # ---------- SKU REGISTRY ----------
 
     def _build_sku_registry_rows(self, raw_df: pd.DataFrame, store_id: int | None) -> list[dict]:
@@ -295,27 +503,90 @@ class SalesIngestService:
             sku = str(r["sku"]).strip()
             if not sku:
                 continue
+            # если SKU уже резолвили недавно -- сразу пишем известный статус
+            res = cached_resolution(sku)
             rows.append(
                 {
                     "store_id": store_id,
                     "sku": sku,
-                    "status": SkuStatus.UNKNOWN,
+                    "status": res.status if res else SkuStatus.UNKNOWN,
                     "last_seen_title": None if pd.isna(r["last_seen_title"]) else str(r["last_seen_title"]),
+                    "resolved_offer_id": res.offer_id if res else None,
+                    "resolved_item_id": res.item_id if res else None,
                 }
             )
         return rows
 
-    def _upsert_sku_registry(self, db: Session, rows: list[dict]) -> int:
-        if not rows:
-            return 0
+    def _upsert_sku_registry(self, db: Session, rows: list[dict]) -> UpsertStats:
+        def _stmt(chunk):
+            stmt = pg_insert(SkuRegistry).values(chunk)
+            return stmt.on_conflict_do_update(
+                constraint="uq_store_sku",
+                set_={
+                    "last_seen_title": stmt.excluded.last_seen_title,
+                    "last_seen_at": func.now(),  # ВАЖНО: реально обновляем
+                },
+            )
 
-        stmt = pg_insert(SkuRegistry).values(rows)
-        stmt = stmt.on_conflict_do_update(
-            constraint="uq_store_sku",
-            set_={
-                "last_seen_title": stmt.excluded.last_seen_title,
-                "last_seen_at": func.now(),  # ВАЖНО: реально обновляем
-            },
+        return chunked_upsert(
+            db,
+            _stmt,
+            rows,
+            max_rows=settings.ingest_batch_max_rows,
+            commit_between=settings.ingest_commit_between_batches,
         )
-        res = db.execute(stmt)
-        return res.rowcount or 0
+
+    # ---------- SKU SALES INDEX ----------
+
+    def _refresh_sku_sales_daily(self, db: Session, fact_rows: list[dict]) -> int:
+        """
+        Пересчитывает sku_sales_daily из sales_fact для SKU, затронутых этим ingest.
+        Пересчёт (а не +=) -> идемпотентно при повторной загрузке того же отчёта.
+        """
+        skus = sorted({r["sku"] for r in fact_rows if r["sku"]})
+        if not skus:
+            return 0
+
+        dates = [r["sale_date"] for r in fact_rows if r["sku"] and r["sale_date"] is not None]
+        has_null_date = any(r["sku"] and r["sale_date"] is None for r in fact_rows)
+
+        date_conds = []
+        if dates:
+            date_conds.append(SalesFact.sale_date.between(min(dates), max(dates)))
+        if has_null_date:
+            date_conds.append(SalesFact.sale_date.is_(None))
+
+        active = SalesFact.status == "active"
+        canceled = SalesFact.status == "canceled"
+
+        refreshed = 0
+        size = settings.ingest_batch_max_rows
+        for start in range(0, len(skus), size):
+            chunk = skus[start:start + size]
+            agg = (
+                select(
+                    SalesFact.sku,
+                    SalesFact.store_id,
+                    SalesFact.sale_date,
+                    func.coalesce(func.sum(SalesFact.qty).filter(active), 0),
+                    func.coalesce(func.sum(SalesFact.qty).filter(canceled), 0),
+                    func.sum(SalesFact.total * SalesFact.qty).filter(active),
+                )
+                .where(SalesFact.sku.in_(chunk), or_(*date_conds))
+                .group_by(SalesFact.sku, SalesFact.store_id, SalesFact.sale_date)
+            )
+            stmt = pg_insert(SkuSalesDaily).from_select(
+                ["sku", "store_id", "sale_date", "qty", "canceled_qty", "revenue"], agg
+            )
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_sku_sales_daily",
+                set_={
+                    "qty": stmt.excluded.qty,
+                    "canceled_qty": stmt.excluded.canceled_qty,
+                    "revenue": stmt.excluded.revenue,
+                    "updated_at": func.now(),
+                },
+            )
+            res = db.execute(stmt)
+            refreshed += res.rowcount or 0
+        return refreshed
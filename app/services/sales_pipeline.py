@@ -3,11 +3,14 @@
 from __future__ import annotations
 
 from datetime import date
+from typing import Callable
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.sales import ReportRun
+from app.services.report_progress import publish_status
 from app.services.sales_reports import SalesReportsService
-from app.services.sales_ingest import SalesIngestService
+from app.services.sku_resolver import SkuResolverService
 
 
 class SalesPipelineService:
@@ -22,7 +25,11 @@ class SalesPipelineService:
     def __init__(self, db: Session):
         self.db = db
         self.reports = SalesReportsService(db)
+        # pandas/openpyxl грузятся только когда пайплайн реально создают
+        from app.services.sales_ingest import SalesIngestService
+
         self.ingest = SalesIngestService()  # ВАЖНО: без аргументов
+        self._fence: Callable[[], None] | None = None
 
     def run_report_and_ingest(
         self,
@@ -47,36 +54,81 @@ class SalesPipelineService:
         self.db.commit()
         self.db.refresh(rr)
 
+        return self.process_run(rr, poll_sec=poll_sec, timeout_sec=timeout_sec)
+
+    def process_run(
+        self,
+        rr: ReportRun,
+        poll_sec: int = 10,
+        timeout_sec: int = 900,
+        fence: Callable[[], None] | None = None,
+    ) -> dict:
+        """
+        Доводит уже существующий ReportRun до INGESTED.
+        Если report_id ещё нет (run из очереди) -- сначала generate.
+        fence() -- перед каждой записью статуса и перед commit данных ingest
+        (очередь: lease всё ещё наш, иначе LeaseLost).
+        """
+        self._fence = fence
+        try:
+            return self._process(rr, poll_sec=poll_sec, timeout_sec=timeout_sec)
+        except Exception as e:
+            if fence is not None:
+                raise  # run очереди: FAILED/повтор решает ReportRunQueue.release
+            # синхронный путь (/sales/report-run, планировщик): иначе run навсегда в промежуточном
+            # статусе, а SSE ждёт финального
+            self.db.rollback()
+            rr.last_error = f"{type(e).__name__}: {e}"
+            self._set_status(rr, "FAILED")
+            raise
+
+    def _process(self, rr: ReportRun, poll_sec: int, timeout_sec: int) -> dict:
+        if not rr.report_id:
+            rr.report_id = self.reports.generate(type_id=rr.type_id, date_from=rr.date_from, date_to=rr.date_to)
+            self._set_status(rr, "CREATED")
+        report_id = rr.report_id
+
         # 2) wait
-        rr.status = "PENDING"
-        self.db.commit()
+        self._set_status(rr, "PENDING")
 
         self.reports.wait_success(report_id=report_id, poll_sec=poll_sec, timeout_sec=timeout_sec)
 
-        rr.status = "SUCCESS"
-        self.db.commit()
+        self._set_status(rr, "SUCCESS")
 
         # 3) download
         content = self.reports.download_bytes(report_id=report_id)
 
         # 4) ingest в тот же ReportRun
-        rr.status = "INGESTING"
-        self.db.commit()
+        self._set_status(rr, "INGESTING")
 
         ingest_result = self.ingest.ingest_excel_bytes(
             db=self.db,
             report_run_id=rr.id,
             excel_bytes=content,
-            store_id=None,
+            store_id=rr.store_id,
+            period=(rr.date_from, rr.date_to),  # отчёт Alif полный за свой период
+            fence=self._fence,
         )
 
-        rr.status = "INGESTED"
-        self.db.commit()
+        self._set_status(rr, "INGESTED")
 
-        return {
+        result = {
             "generated_report_run_id": rr.id,
             "alif_report_id": report_id,
-            "date_from": str(date_from),
-            "date_to": str(date_to),
+            "date_from": str(rr.date_from),
+            "date_to": str(rr.date_to),
             "ingest": ingest_result,
         }
+
+        # 5) опционально: резолв новых SKU против каталога
+        if settings.sku_resolve_after_ingest:
+            result["sku_resolve"] = SkuResolverService(self.db).resolve_pending()
+
+        return result
+
+    def _set_status(self, rr: ReportRun, status: str) -> None:
+        if self._fence is not None:
+            self._fence()
+        rr.status = status
+        self.db.commit()
+        publish_status(rr.id, status)
@@ -9,13 +9,11 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.ratelimit import alif_request
 from app.models.account import MerchantAccount, AccountType
 from app.services.auth import AuthService
 
 
-API_BASE = "https://api-merchant.alif.uz/merchant/excel/excel/v1/reports"
-
-
 class SalesReportsService:
     def __init__(self, db: Session):
         self.db = db
@@ -46,7 +44,7 @@ class SalesReportsService:
             "datetime_to": str(date_to),
         }
         with httpx.Client(timeout=60) as client:
-            r = client.post(f"{API_BASE}/generate", headers=self._headers(), json=payload)
+            r = alif_request(client, "generate", "POST", f"{settings.alif_reports_base}/generate", headers=self._headers(), json=payload)
             r.raise_for_status()
             data = r.json()
         report_id = data.get("report_id")
@@ -56,7 +54,7 @@ class SalesReportsService:
 
     def check(self, report_id: str) -> str:
         with httpx.Client(timeout=60) as client:
-            r = client.get(f"{API_BASE}/check", headers=self._headers(), params={"report_id": report_id})
+            r = alif_request(client, "check", "GET", f"{settings.alif_reports_base}/check", headers=self._headers(), params={"report_id": report_id})
             r.raise_for_status()
             data = r.json()
         return str(data.get("status") or "UNKNOWN")
@@ -77,6 +75,6 @@ class SalesReportsService:
         headers = self._headers()
         headers["accept"] = "*/*"
         with httpx.Client(timeout=180) as client:
-            r = client.get(f"{API_BASE}/download", headers=headers, params={"report_id": report_id})
+            r = alif_request(client, "download", "GET", f"{settings.alif_reports_base}/download", headers=headers, params={"report_id": report_id})
             r.raise_for_status()
             return r.content
@@ -0,0 +1,83 @@
+# app/services/sales_summary.py
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.response_cache import month_of, response_cache
+from app.models.sales import SalesFact
+
+
+def invalidate_sales_cache(fact_rows: Iterable[dict]) -> int:
+    """
+    Сбрасывает кеш ответов только по тому, что реально поменялось: месяцы sale_date x store_id
+    записанных/снятых групп. Звать после commit, иначе кеш успеет наполниться старыми данными.
+    """
+    months, stores = set(), set()
+    for r in fact_rows:
+        months.add(month_of(r["sale_date"]))
+        stores.add(r["store_id"])
+    return response_cache().invalidate(months, stores)
+
+
+class SalesSummaryService:
+    """
+    Сводка для дашбордов: продажи по магазину за месяц из sales_fact.
+    Только чтение -> AsyncSession; ответы кешируются в роуте (response_cache).
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def monthly_by_store(
+        self,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        store_id: int | None = None,
+    ) -> dict:
+        active = SalesFact.status == "active"
+        canceled = SalesFact.status == "canceled"
+        month = cast(func.date_trunc("month", SalesFact.sale_date), Date).label("month")
+
+        q = (
+            select(
+                month,
+                SalesFact.store_id,
+                SalesFact.store_name,
+                func.coalesce(func.sum(SalesFact.qty).filter(active), 0).label("qty"),
+                func.coalesce(func.sum(SalesFact.qty).filter(canceled), 0).label("canceled_qty"),
+                func.sum(SalesFact.total * SalesFact.qty).filter(active).label("revenue"),
+                func.count(func.distinct(SalesFact.sku)).label("skus"),
+            )
+            .group_by(month, SalesFact.store_id, SalesFact.store_name)
+            .order_by(month, SalesFact.store_id, SalesFact.store_name)
+        )
+        if date_from is not None:
+            q = q.where(SalesFact.sale_date >= date_from)
+        if date_to is not None:
+            q = q.where(SalesFact.sale_date <= date_to)
+        if store_id is not None:
+            q = q.where(SalesFact.store_id == store_id)
+
+        rows = (await self.db.execute(q)).all()
+        return {
+            "date_from": None if date_from is None else str(date_from),
+            "date_to": None if date_to is None else str(date_to),
+            "store_id": store_id,
+            "rows": [
+                {
+                    "month": None if r.month is None else str(r.month)[:7],
+                    "store_id": r.store_id,
+                    "store_name": r.store_name,
+                    "qty": int(r.qty),
+                    "canceled_qty": int(r.canceled_qty),
+                    "revenue": None if r.revenue is None else float(r.revenue),
+                    "skus": int(r.skus),
+                }
+                for r in rows
+            ],
+        }
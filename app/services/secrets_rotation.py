@@ -0,0 +1,47 @@
+# app/services/secrets_rotation.py
+
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.crypto import needs_rotation, rotate_str
+from app.models.account import MerchantAccount
+
+
+class SecretsRotationService:
+    """
+    Пакетная перешифровка merchant_accounts текущим ключом (после смены APP_SECRET_KEY).
+    Старый ключ должен оставаться в APP_SECRET_KEYS_OLD, пока это не отработает.
+    """
+
+    ENC_FIELDS = ("password_enc", "refresh_token_enc")
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def rotate_all(self, batch_size: int = 500) -> dict:
+        scanned = 0
+        rotated = 0
+        last_id = 0
+        while True:
+            accounts = self.db.execute(
+                select(MerchantAccount)
+                .where(MerchantAccount.id > last_id)
+                .order_by(MerchantAccount.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not accounts:
+                break
+
+            for acc in accounts:
+                scanned += 1
+                for field in self.ENC_FIELDS:
+                    value = getattr(acc, field)
+                    if value and needs_rotation(value):
+                        setattr(acc, field, rotate_str(value))
+                        rotated += 1
+            last_id = accounts[-1].id
+            self.db.commit()
+
+        return {"accounts_scanned": scanned, "values_rotated": rotated}
@@ -0,0 +1,205 @@
+# app/services/sku_resolver.py
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+import httpx
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.ratelimit import alif_request
+from app.models.account import MerchantAccount, AccountType
+from app.models.sales import SkuRegistry, SkuStatus
+from app.services.auth import AuthService
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SkuResolution:
+    status: SkuStatus
+    offer_id: str | None = None
+    item_id: int | None = None
+
+
+# sku -> SkuResolution; общий на процесс, чтобы горячие SKU не резолвились на каждом ingest
+@lru_cache
+def _resolution_cache() -> TTLCache:
+    return TTLCache(
+        maxsize=settings.sku_resolve_cache_size,
+        ttl_sec=settings.sku_resolve_cache_ttl_sec,
+    )
+
+
+def cached_resolution(sku: str) -> SkuResolution | None:
+    return _resolution_cache().get(sku)
+
+
+class SkuResolverService:
+    """
+    Резолв SKU из sku_registry против каталога Alif:
+    1) берёт пачку UNKNOWN и MISSING старше sku_missing_recheck_sec (SKU мог появиться в каталоге)
+    2) отвечает из in-process LRU+TTL кеша, что уже известно (кроме перепроверки MISSING)
+    3) остальное спрашивает у каталога батчами, параллельно (не больше sku_resolve_concurrency запросов)
+    4) проставляет ACTIVE (+ offer_id/item_id) или MISSING и resolved_at;
+       SKU из упавшего батча не трогает -- повторятся в следующем прогоне
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.auth = AuthService(db)
+
+    def _headers(self) -> dict:
+        main = self.db.execute(
+            select(MerchantAccount).where(MerchantAccount.account_type == AccountType.MAIN)
+        ).scalar_one_or_none()
+        if not main:
+            raise ValueError("MAIN аккаунт не найден. Сначала добавь его через POST /accounts.")
+
+        token = self.auth.get_valid_access_token(main.id)
+        return {
+            "accept": "application/json, text/plain, */*",
+            "apikey": settings.alif_api_key,
+            "locale": settings.alif_locale,
+            "authorization": f"Bearer {token}",
+        }
+
+    def resolve_pending(self, limit: int = 1000) -> dict:
+        recheck_before = func.now() - timedelta(seconds=settings.sku_missing_recheck_sec)
+        stale_missing = and_(
+            SkuRegistry.status == SkuStatus.MISSING,
+            or_(SkuRegistry.resolved_at.is_(None), SkuRegistry.resolved_at < recheck_before),
+        )
+        pending = self.db.execute(
+            select(SkuRegistry.id, SkuRegistry.sku, SkuRegistry.status)
+            .where(or_(SkuRegistry.status == SkuStatus.UNKNOWN, stale_missing))
+            # сначала новые UNKNOWN, перепроверка MISSING -- на остаток лимита
+            .order_by((SkuRegistry.status == SkuStatus.MISSING).asc(), SkuRegistry.last_seen_at.desc())
+            .limit(limit)
+        ).all()
+        if not pending:
+            return {"pending": 0, "rechecked": 0, "from_cache": 0, "resolved": 0, "active": 0, "missing": 0,
+                    "failed": 0, "errors": []}
+
+        skus = sorted({sku for _, sku, _ in pending})
+        # перепроверяемый MISSING из кеша брать нельзя: кеш вернёт тот же MISSING
+        recheck = {sku for _, sku, status in pending if status == SkuStatus.MISSING}
+
+        known: dict[str, SkuResolution] = {}
+        to_fetch: list[str] = []
+        for sku in skus:
+            hit = None if sku in recheck else _resolution_cache().get(sku)
+            if hit is not None:
+                known[sku] = hit
+            else:
+                to_fetch.append(sku)
+        from_cache = len(known)
+
+        failed: set[str] = set()
+        errors: list[str] = []
+        if to_fetch:
+            fetched, failed, errors = self._fetch(to_fetch)
+            for sku in to_fetch:
+                if sku in failed:
+                    continue  # батч не ответил: не кешируем, строка остаётся как была до следующего прогона
+                res = fetched.get(sku) or SkuResolution(status=SkuStatus.MISSING)
+                _resolution_cache().set(sku, res)
+                known[sku] = res
+
+        updates = []
+        for row_id, sku, _ in pending:
+            res = known.get(sku)
+            if res is None:
+                continue
+            updates.append(
+                {
+                    "id": row_id,
+                    "status": res.status,
+                    "resolved_offer_id": res.offer_id,
+                    "resolved_item_id": res.item_id,
+                    "resolved_at": func.now(),
+                }
+            )
+        if updates:
+            # bulk UPDATE по первичному ключу (executemany)
+            self.db.execute(update(SkuRegistry), updates)
+        self.db.commit()
+
+        active = sum(1 for u in updates if u["status"] == SkuStatus.ACTIVE)
+        return {
+            "pending": len(pending),
+            "rechecked": sum(1 for _, sku, _ in pending if sku in recheck),
+            "from_cache": from_cache,
+            "resolved": len(to_fetch) - len(failed),
+            "active": active,
+            "missing": len(updates) - active,
+            "failed": len(failed),
+            "errors": errors,
+        }
+
+    # ---------- catalog ----------
+
+    def _fetch(self, skus: list[str]) -> tuple[dict[str, SkuResolution], set[str], list[str]]:
+        """
+        -> (найденные, SKU из упавших батчей, ошибки). Ошибка одного батча (5xx, таймаут, мусор в ответе)
+        не роняет прогон: остальные батчи применяются, упавшие SKU уходят в следующий прогон.
+        """
+        headers = self._headers()  # токен берём один раз в текущем потоке (сессия БД не потокобезопасна)
+        size = max(1, settings.sku_resolve_batch_size)
+        batches = [skus[i:i + size] for i in range(0, len(skus), size)]
+
+        out: dict[str, SkuResolution] = {}
+        failed: set[str] = set()
+        errors: list[str] = []
+        with httpx.Client(timeout=60) as client:
+
+            def lookup(batch: list[str]) -> dict[str, SkuResolution] | Exception:
+                try:
+                    return self._lookup_batch(client, headers, batch)
+                except Exception as e:
+                    return e
+
+            with ThreadPoolExecutor(max_workers=max(1, settings.sku_resolve_concurrency)) as pool:
+                for batch, part in zip(batches, pool.map(lookup, batches)):
+                    if isinstance(part, Exception):
+                        # у HTTPStatusError в тексте весь URL со списком SKU -- оставляем первую строку, обрезанную
+                        error = f"{type(part).__name__}: {str(part).splitlines()[0][:200] if str(part) else ''}"
+                        log.warning("sku resolve: батч из %d SKU не резолвлен: %s", len(batch), error)
+                        failed.update(batch)
+                        errors.append(error)
+                    else:
+                        out.update(part)
+        return out, failed, errors
+
+    def _lookup_batch(self, client: httpx.Client, headers: dict, skus: list[str]) -> dict[str, SkuResolution]:
+        r = alif_request(
+            client, "api", "GET", settings.alif_catalog_url, headers=headers, params={"skus": ",".join(skus)}
+        )
+        r.raise_for_status()
+        data = r.json()
+
+        # API может вернуть list или {"data":[...]}
+        items = data.get("data") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise RuntimeError(f"Неожиданный формат ответа каталога: {type(data)}")
+
+        out: dict[str, SkuResolution] = {}
+        for it in items:
+            sku = str(it.get("sku") or "").strip()
+            if not sku:
+                continue
+            offer_id = it.get("offer_id") or it.get("id")
+            item_id = it.get("item_id")
+            out[sku] = SkuResolution(
+                status=SkuStatus.ACTIVE,
+                offer_id=None if offer_id is None else str(offer_id),
+                item_id=None if item_id is None else int(item_id),
+            )
+        return out
@@ -0,0 +1,82 @@
+# app/services/sku_sales.py
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sales import SkuRegistry, SkuSalesDaily
+
+
+class SkuSalesService:
+    """
+    Чтение предрасчитанного индекса sku_sales_daily:
+    "как продавался SKU X по магазинам за последние N дней" -- index range scan по uq_sku_sales_daily,
+    без скана sales_fact.
+    Только чтение -> работает на AsyncSession, не занимает threadpool.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def sku_sales(
+        self,
+        sku: str,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        store_id: int | None = None,
+        days: int = 90,
+    ) -> dict:
+        date_to = date_to or date.today()
+        date_from = date_from or (date_to - timedelta(days=days))
+
+        q = (
+            select(
+                SkuSalesDaily.store_id,
+                SkuSalesDaily.sale_date,
+                SkuSalesDaily.qty,
+                SkuSalesDaily.canceled_qty,
+                SkuSalesDaily.revenue,
+            )
+            .where(
+                SkuSalesDaily.sku == sku,
+                SkuSalesDaily.sale_date.between(date_from, date_to),
+            )
+            .order_by(SkuSalesDaily.store_id, SkuSalesDaily.sale_date)
+        )
+        if store_id is not None:
+            q = q.where(SkuSalesDaily.store_id == store_id)
+
+        rows = (await self.db.execute(q)).all()
+
+        # названия из sku_registry (по магазину, если есть; иначе любое)
+        titles = dict(
+            (
+                await self.db.execute(
+                    select(SkuRegistry.store_id, SkuRegistry.last_seen_title).where(SkuRegistry.sku == sku)
+                )
+            ).all()
+        )
+        title = titles.get(store_id) or next((t for t in titles.values() if t), None)
+
+        return {
+            "sku": sku,
+            "title": title,
+            "date_from": str(date_from),
+            "date_to": str(date_to),
+            "qty": sum(r.qty for r in rows),
+            "canceled_qty": sum(r.canceled_qty for r in rows),
+            "revenue": float(sum(r.revenue or 0 for r in rows)),
+            "rows": [
+                {
+                    "store_id": r.store_id,
+                    "sale_date": None if r.sale_date is None else str(r.sale_date),
+                    "qty": r.qty,
+                    "canceled_qty": r.canceled_qty,
+                    "revenue": None if r.revenue is None else float(r.revenue),
+                }
+                for r in rows
+            ],
+        }
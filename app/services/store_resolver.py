@@ -0,0 +1,155 @@
+# app/services/store_resolver.py
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.store import Store, UnmatchedStoreName
+
+# кириллица, которая выглядит как латиница (смешанная раскладка в названиях) -> латиница
+_HOMOGLYPHS = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "ё": "e", "і": "i", "ј": "j", "к": "k", "м": "m",
+    "н": "h", "о": "o", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s",
+})
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_store_name(name: str | None) -> str | None:
+    """
+    Ключ сопоставления названий: NFKC, casefold, кириллические двойники латиницы -> латиница,
+    пунктуация/кавычки/№ -> пробел, пробелы схлопнуты: "Магазин «Юнусабад» №1" == "магазин юнусабад 1"
+    (и с латинскими "a"/"o"/"c" внутри кириллицы). Обе стороны нормализуются одинаково.
+    """
+    if not name:
+        return None
+    s = unicodedata.normalize("NFKC", name.replace("№", " ")).casefold().translate(_HOMOGLYPHS)  # № заменяем до NFKC (иначе NFKC даст "No")
+    s = _NON_WORD.sub(" ", s).strip()
+    return s or None
+
+
+@dataclass
+class StoreNameIndex:
+    by_norm: dict[str, int] = field(default_factory=dict)
+    ambiguous: set[str] = field(default_factory=set)  # разные stores.id с одинаковым ключом -- не угадываем
+    loaded_at: float = 0.0
+
+    @classmethod
+    def load(cls, db: Session) -> "StoreNameIndex":
+        idx = cls(loaded_at=time.monotonic())
+        for store_id, name in db.execute(select(Store.id, Store.name)):
+            key = normalize_store_name(name)
+            if key is None:
+                continue
+            prev = idx.by_norm.get(key)
+            if prev is not None and prev != store_id:
+                idx.ambiguous.add(key)
+            idx.by_norm[key] = store_id
+        for key in idx.ambiguous:
+            del idx.by_norm[key]
+        return idx
+
+    def lookup(self, name: str | None) -> int | None:
+        key = normalize_store_name(name)
+        return None if key is None else self.by_norm.get(key)
+
+
+_index: StoreNameIndex | None = None
+_index_lock = threading.Lock()
+
+
+def store_name_index(db: Session) -> StoreNameIndex:
+    """Индекс на процесс; перечитывается раз в store_index_ttl_sec или после reset (stores/sync)."""
+    global _index
+    with _index_lock:
+        idx = _index
+        if idx is None or time.monotonic() - idx.loaded_at > settings.store_index_ttl_sec:
+            idx = _index = StoreNameIndex.load(db)
+        return idx
+
+
+def reset_store_name_index() -> None:
+    global _index
+    with _index_lock:
+        _index = None
+
+
+class StoreResolver:
+    """
+    store_name из отчёта -> stores.id для групп sales_fact:
+    - индекс normalize(stores.name) -> id грузится один раз и живёт в памяти процесса
+    - на ingest: по одному lookup на уникальное название, store_id проставляется всем группам разом
+    - несопоставленные названия копятся в unmatched_store_names (GET /stores/unmatched)
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def attach(self, fact_rows: list[dict], report_run_id: int | None = None) -> dict:
+        pending = [r for r in fact_rows if r["store_id"] is None and r["store_name"]]
+        if not pending:
+            return {"names": 0, "matched": 0, "unmatched": 0, "groups_resolved": 0}
+
+        idx = store_name_index(self.db)
+        groups = Counter(r["store_name"] for r in pending)
+        resolved = {name: idx.lookup(name) for name in groups}
+
+        resolved_groups = 0
+        for r in pending:
+            sid = resolved[r["store_name"]]
+            if sid is not None:
+                r["store_id"] = sid
+                resolved_groups += 1
+
+        unmatched = {name: n for name, n in groups.items() if resolved[name] is None}
+        self._record_unmatched(unmatched, report_run_id)
+        return {
+            "names": len(groups),
+            "matched": len(groups) - len(unmatched),
+            "unmatched": len(unmatched),
+            "groups_resolved": resolved_groups,
+        }
+
+    def _record_unmatched(self, unmatched: dict[str, int], report_run_id: int | None) -> None:
+        if not unmatched:
+            return
+        stmt = pg_insert(UnmatchedStoreName).values(
+            [
+                {
+                    "name": name,
+                    "normalized": normalize_store_name(name),
+                    "groups_seen": n,
+                    "last_report_run_id": report_run_id,
+                }
+                for name, n in sorted(unmatched.items())
+            ]
+        )
+        self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["name"],
+                set_={
+                    "groups_seen": stmt.excluded.groups_seen,
+                    "last_report_run_id": stmt.excluded.last_report_run_id,
+                    "last_seen_at": func.now(),
+                },
+            )
+        )
+
+    def prune_unmatched(self) -> int:
+        """После синка stores: убрать названия, которые теперь сопоставляются."""
+        reset_store_name_index()
+        idx = store_name_index(self.db)
+        rows = self.db.execute(select(UnmatchedStoreName.id, UnmatchedStoreName.name)).all()
+        matched = [row_id for row_id, name in rows if idx.lookup(name) is not None]
+        if matched:
+            self.db.execute(delete(UnmatchedStoreName).where(UnmatchedStoreName.id.in_(matched)))
+        return len(matched)
@@ -4,15 +4,17 @@ import httpx
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.ratelimit import alif_request
 from app.models.store import Store
 from app.models.account import MerchantAccount, AccountType
-from app.services.auth import TokenManager
+from app.services.auth import AuthService
+from app.services.store_resolver import StoreResolver
 
 
 class StoresService:
     def __init__(self, db: Session):
         self.db = db
-        self.tm = TokenManager(db)
+        self.auth = AuthService(db)
 
     def _api_headers(self, access_token: str) -> dict:
         return {
@@ -32,11 +34,11 @@ class StoresService:
         if not main:
             raise ValueError("MAIN аккаунт не найден. Сначала POST /accounts (account_type=main).")
 
-        token = self.tm.ensure_access_token(main)
+        token = self.auth.get_valid_access_token(main.id)
 
         url = f"{settings.alif_api_base}/merchant/merchant/stores"
         with httpx.Client(timeout=30) as client:
-            r = client.get(url, headers=self._api_headers(token))
+            r = alif_request(client, "api", "GET", url, headers=self._api_headers(token))
             r.raise_for_status()
             data = r.json()
 
@@ -61,4 +63,8 @@ class StoresService:
             upserted += 1
 
         self.db.commit()
-        return {"count": len(stores), "upserted": upserted}
+
+        # новые/переименованные магазины -> индекс названий перечитать, сопоставившиеся убрать из unmatched
+        pruned = StoreResolver(self.db).prune_unmatched()
+        self.db.commit()
+        return {"count": len(stores), "upserted": upserted, "unmatched_pruned": pruned}
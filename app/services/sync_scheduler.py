@@ -0,0 +1,119 @@
+# app/services/sync_scheduler.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal, get_engine
+from app.models.sales import ReportRun, SyncWatermark
+from app.services.sales_pipeline import SalesPipelineService
+from app.services.stores import StoresService
+
+log = logging.getLogger(__name__)
+
+# ключ pg advisory lock: один на кластер, чтобы из N реплик синк крутила только одна
+SYNC_LOCK_KEY = 0x414C4946_01  # "ALIF" + 1
+
+
+class SyncSchedulerService:
+    """
+    Инкрементальный синк:
+    1) берёт advisory lock (если занят -- другая реплика уже синкает, выходим)
+    2) для каждого type_id из sync_type_ids: период [watermark .. сегодня] -> report-run + ingest
+    3) двигает watermark
+    4) синкает магазины
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def run_once(self) -> dict:
+        # lock держим на отдельном соединении: сессия отдаёт своё в пул после каждого commit
+        with self.db.get_bind().connect() as lock_conn:
+            locked = lock_conn.execute(select(func.pg_try_advisory_lock(SYNC_LOCK_KEY))).scalar()
+            # session-level lock переживает commit; без него соединение висит idle in transaction
+            # весь _sync (держит xmin -> vacuum sales_fact, idle_in_transaction_session_timeout)
+            lock_conn.commit()
+            if not locked:
+                return {"skipped": "locked"}
+            try:
+                return self._sync()
+            finally:
+                lock_conn.execute(select(func.pg_advisory_unlock(SYNC_LOCK_KEY)))
+                lock_conn.commit()
+
+    def _sync(self) -> dict:
+        today = date.today()
+        reports = []
+        for type_id in settings.sync_type_ids:
+            date_from = self._period_start(type_id, today)
+            if date_from > today:
+                continue
+
+            result = SalesPipelineService(self.db).run_report_and_ingest(
+                type_id=type_id,
+                date_from=date_from,
+                date_to=today,
+                poll_sec=settings.sync_poll_sec,
+                timeout_sec=settings.sync_timeout_sec,
+            )
+            self._advance(type_id, today, result["generated_report_run_id"])
+            reports.append(result)
+
+        stores = StoresService(self.db).sync()
+        return {"reports": reports, "stores": stores}
+
+    def _period_start(self, type_id: int, today: date) -> date:
+        wm = self.db.get(SyncWatermark, type_id)
+        if wm:
+            last = wm.last_date_to
+        else:
+            # watermark ещё нет -- стартуем от последнего INGESTED ReportRun этого типа
+            last = self.db.execute(
+                select(func.max(ReportRun.date_to)).where(
+                    ReportRun.type_id == type_id,
+                    ReportRun.status == "INGESTED",
+                )
+            ).scalar()
+            if last is None:
+                return today - timedelta(days=settings.sync_initial_days)
+
+        # последний день перегружаем: на момент прошлого синка он мог быть неполным (upsert идемпотентен)
+        return last
+
+    def _advance(self, type_id: int, date_to: date, report_run_id: int) -> None:
+        wm = self.db.get(SyncWatermark, type_id)
+        if wm is None:
+            wm = SyncWatermark(type_id=type_id, last_date_to=date_to)
+            self.db.add(wm)
+        wm.last_date_to = date_to
+        wm.last_report_run_id = report_run_id
+        self.db.commit()
+
+
+def _tick() -> dict:
+    db = SessionLocal(bind=get_engine())
+    try:
+        return SyncSchedulerService(db).run_once()
+    finally:
+        db.close()
+
+
+async def run_forever(interval_sec: int | None = None) -> None:
+    """
+    asyncio-цикл планировщика; сама работа (HTTP к Alif, pandas) -- в отдельном потоке.
+    """
+    interval = interval_sec or settings.sync_interval_sec
+    while True:
+        try:
+            result = await asyncio.to_thread(_tick)
+            log.info("sync tick: %s", result)
+        except Exception:
+            log.exception("sync tick failed")
+        await asyncio.sleep(interval)
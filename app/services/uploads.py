@@ -0,0 +1,256 @@
+# app/services/uploads.py
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal, get_engine
+from app.models.sales import ReportRun
+from app.models.upload import UploadSession
+from app.services.report_progress import publish_status
+
+log = logging.getLogger(__name__)
+
+# type_id для ReportRun, созданных не через Alif generate, а загрузкой файла
+MANUAL_TYPE_ID = 0
+
+
+class UploadOffsetMismatch(ValueError):
+    def __init__(self, expected: int, got: int):
+        super().__init__(f"Ожидался offset {expected}, получен {got}")
+        self.expected = expected
+        self.got = got
+
+
+def create_manual_report_run(
+    db: Session, label: str, store_id: int | None = None, commit: bool = True
+) -> ReportRun:
+    """
+    ReportRun под ручную загрузку xlsx (без Alif report_id и без известного периода).
+    commit=False -- только flush (id есть), транзакция вызывающего остаётся открытой.
+    """
+    today = date.today()
+    rr = ReportRun(
+        store_id=store_id,
+        report_id=label[:64],
+        type_id=MANUAL_TYPE_ID,
+        date_from=today,
+        date_to=today,
+        status="CREATED",
+    )
+    db.add(rr)
+    if not commit:
+        db.flush()
+        return rr
+    db.commit()
+    db.refresh(rr)
+    return rr
+
+
+def describe(up: UploadSession) -> dict:
+    return {
+        "upload_id": up.id,
+        "filename": up.filename,
+        "status": up.status,
+        "total_size": up.total_size,
+        "received_bytes": up.received_bytes,
+        "sha256": up.sha256,
+        "report_run_id": up.report_run_id,
+        "stage": up.stage,
+        "rows_total": up.rows_total,
+        "rows_processed": up.rows_processed,
+        "error": up.error,
+    }
+
+
+class UploadService:
+    """
+    Загрузка больших xlsx по частям:
+    1) init -> upload_id
+    2) PUT чанков по offset (пишем сразу на диск; повтор уже принятого чанка -- no-op, можно докачивать)
+    3) complete -> sha256 всего файла, ReportRun, ingest в фоне
+    4) статус: принятые байты / строки, обработанные ingest
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def path_for(upload_id: str) -> Path:
+        return Path(settings.upload_dir) / f"{upload_id}.xlsx"
+
+    def init(
+        self,
+        filename: str | None,
+        total_size: int | None = None,
+        sha256: str | None = None,
+        store_id: int | None = None,
+    ) -> UploadSession:
+        up = UploadSession(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            total_size=total_size,
+            expected_sha256=sha256.lower() if sha256 else None,
+            store_id=store_id,
+            status="UPLOADING",
+            received_bytes=0,
+            rows_processed=0,
+        )
+        Path(settings.upload_dir).mkdir(parents=True, exist_ok=True)
+        self.path_for(up.id).touch()
+
+        self.db.add(up)
+        self.db.commit()
+        self.db.refresh(up)
+        return up
+
+    def _locked(self, upload_id: str) -> UploadSession:
+        up = self.db.execute(
+            select(UploadSession).where(UploadSession.id == upload_id).with_for_update()
+        ).scalar_one_or_none()
+        if up is None:
+            raise LookupError(f"Загрузка {upload_id} не найдена")
+        return up
+
+    def write_chunk(self, upload_id: str, offset: int, data: bytes, chunk_sha256: str | None = None) -> UploadSession:
+        if chunk_sha256 and hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+            raise ValueError("sha256 чанка не совпадает -- повторите отправку")
+        if len(data) > settings.upload_max_chunk_bytes:
+            raise ValueError(f"Чанк больше {settings.upload_max_chunk_bytes} байт")
+
+        up = self._locked(upload_id)  # FOR UPDATE: параллельные PUT одного upload сериализуются
+        if up.status != "UPLOADING":
+            raise ValueError(f"Загрузка уже в статусе {up.status}")
+
+        received = up.received_bytes
+        end = offset + len(data)
+        if offset > received:
+            self.db.rollback()
+            raise UploadOffsetMismatch(expected=received, got=offset)
+        if end <= received:
+            self.db.rollback()
+            return up  # повтор уже принятого чанка
+        if up.total_size is not None and end > up.total_size:
+            self.db.rollback()
+            raise ValueError(f"Чанк выходит за total_size={up.total_size}")
+
+        tail = data[received - offset:]
+        with open(self.path_for(upload_id), "r+b") as f:
+            f.seek(received)
+            f.write(tail)
+            f.truncate()  # хвост от оборванной записи, которую не успели зафиксировать в БД
+            f.flush()
+            os.fsync(f.fileno())
+
+        up.received_bytes = end
+        self.db.commit()
+        self.db.refresh(up)
+        return up
+
+    def complete(self, upload_id: str) -> tuple[UploadSession, bool]:
+        """-> (загрузка, queued): queued=True только у вызова, который перевёл её в QUEUED."""
+        up = self._locked(upload_id)
+        if up.status != "UPLOADING":
+            self.db.rollback()
+            return up, False  # повторный complete -- просто текущий статус
+
+        if up.total_size is not None and up.received_bytes != up.total_size:
+            self.db.rollback()
+            raise UploadOffsetMismatch(expected=up.received_bytes, got=up.total_size)
+
+        digest = hashlib.sha256()
+        with open(self.path_for(upload_id), "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        up.sha256 = digest.hexdigest()
+        if up.expected_sha256 and up.expected_sha256 != up.sha256:
+            up.status = "FAILED"
+            up.error = f"sha256 файла {up.sha256} != ожидаемого {up.expected_sha256}"
+            self.db.commit()
+            return up, False
+
+        # ReportRun и QUEUED -- одной транзакцией под FOR UPDATE: commit внутри отпустил бы блокировку
+        # при статусе UPLOADING, и параллельный complete завёл бы второй ReportRun и второй ingest
+        rr = create_manual_report_run(self.db, label=f"upload:{up.id}", store_id=up.store_id, commit=False)
+        up.report_run_id = rr.id
+        up.status = "QUEUED"
+        self.db.commit()
+        self.db.refresh(up)
+        return up, True
+
+
+class _UploadProgress:
+    """
+    Пишет прогресс ingest в upload_sessions отдельными короткими транзакциями
+    (основная сессия ingest держит одну большую). Не чаще раза в секунду, кроме смены стадии.
+    """
+
+    MIN_INTERVAL_SEC = 1.0
+
+    def __init__(self, upload_id: str):
+        self.upload_id = upload_id
+        self._last = 0.0
+        self._stage: str | None = None
+
+    def __call__(self, stage: str, done: int, total: int) -> None:
+        now = time.monotonic()
+        if stage == self._stage and now - self._last < self.MIN_INTERVAL_SEC:
+            return
+        self._stage, self._last = stage, now
+
+        values = {"stage": stage}
+        if stage == "parsed":
+            values["rows_total"] = total
+        elif stage in ("raw", "done"):
+            values["rows_processed"] = done
+        with get_engine().begin() as conn:
+            conn.execute(update(UploadSession).where(UploadSession.id == self.upload_id).values(**values))
+
+
+def run_upload_ingest(upload_id: str) -> None:
+    """Фоновая задача после complete: ingest собранного файла в его ReportRun."""
+    from app.services.sales_ingest import SalesIngestService  # pandas -- лениво
+
+    db = SessionLocal(bind=get_engine())
+    try:
+        up = db.get(UploadSession, upload_id)
+        if up is None or up.status != "QUEUED":
+            return
+        rr = db.get(ReportRun, up.report_run_id)
+        up.status = rr.status = "INGESTING"
+        db.commit()
+        publish_status(rr.id, rr.status)
+
+        try:
+            SalesIngestService().ingest_excel(
+                db=db,
+                report_run_id=rr.id,
+                source=UploadService.path_for(upload_id),
+                store_id=up.store_id,
+                on_progress=_UploadProgress(upload_id),
+            )
+        except Exception as e:
+            db.rollback()
+            log.exception("upload %s: ingest failed", upload_id)
+            up.status = rr.status = "FAILED"
+            up.error = f"{type(e).__name__}: {e}"
+            db.commit()
+            publish_status(rr.id, rr.status)
+            return
+
+        up.status = rr.status = "INGESTED"
+        db.commit()
+        publish_status(rr.id, rr.status)
+        UploadService.path_for(upload_id).unlink(missing_ok=True)
+    finally:
+        db.close()
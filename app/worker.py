@@ -0,0 +1,22 @@
+# app/worker.py
+# отдельная точка входа для фоновых задач: python -m app.worker
+# - планировщик инкрементального синка
+# - воркеры очереди report_runs (queue_concurrency штук на процесс)
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.services.report_queue import run_queue_forever
+from app.services.sync_scheduler import run_forever
+
+
+async def main() -> None:
+    tasks = [run_forever()]
+    tasks += [run_queue_forever() for _ in range(settings.queue_concurrency)]
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
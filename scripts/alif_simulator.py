@@ -0,0 +1,232 @@
+# scripts/alif_simulator.py
+# Локальный симулятор Alif API для нагрузочных прогонов: python scripts/alif_simulator.py --port 8099
+#
+# Отдаёт то, что дергает приложение:
+# - POST {reports}/generate, GET {reports}/check, GET {reports}/download  (reports = /merchant/excel/excel/v1/reports)
+# - POST /token                                 -- keycloak password/refresh flow
+# - GET  /merchant/merchant/stores
+# - GET  /merchant/catalog/v1/offers/by-sku     -- резолв SKU
+# - GET  /_sim/stats                            -- счётчики симулятора (для loadtest.py)
+#
+# Приложение направляется сюда через env:
+#   ALIF_API_BASE=http://127.0.0.1:8099
+#   ALIF_REPORTS_BASE=http://127.0.0.1:8099/merchant/excel/excel/v1/reports
+#   ALIF_AUTH_URL=http://127.0.0.1:8099/token
+#   ALIF_CATALOG_URL=http://127.0.0.1:8099/merchant/catalog/v1/offers/by-sku
+#
+# Резолв SKU против каталога симулятора (без приложения и БД): python scripts/check_sku_resolver.py
+#
+# Задержка, доля 5xx, доля 429 (с Retry-After), время готовности и размер xlsx -- флагами (см. --help).
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+
+from fastapi import FastAPI, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+
+REPORTS_PREFIX = "/merchant/excel/excel/v1/reports"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@dataclass
+class SimConfig:
+    latency_ms: float = 50.0          # средняя задержка ответа
+    latency_jitter_ms: float = 25.0   # разброс (нормальное распределение, обрезано снизу нулём)
+    fail_rate: float = 0.0            # доля ответов 503
+    rate_429: float = 0.0             # доля ответов 429
+    retry_after_sec: float = 1.0      # Retry-After у 429
+    report_ready_sec: float = 5.0     # через сколько после generate check вернёт SUCCESS
+    report_fail_rate: float = 0.0     # доля отчётов, которые закончатся FAILED
+    report_rows: int = 5000           # строк в xlsx
+    stores: int = 20
+    skus: int = 2000
+    catalog_miss_rate: float = 0.1    # доля SKU, которых "нет" в каталоге
+    token_ttl_sec: int = 300
+    seed: int = 42
+
+
+@dataclass
+class _Report:
+    date_from: date
+    date_to: date
+    ready_at: float
+    failed: bool
+
+
+def store_names(n: int) -> list[str]:
+    return [f"Магазин №{i}" for i in range(1, n + 1)]
+
+
+@lru_cache(maxsize=32)
+def build_xlsx(rows: int, date_from: date, date_to: date, stores: int = 20, skus: int = 2000, seed: int = 42) -> bytes:
+    """
+    xlsx в формате выгрузки Alif: безымянный первый столбец (номер строки) + 19 колонок,
+    порядок как в SalesIngestService.EXPECTED_COLS. Детерминирован по аргументам.
+    """
+    from openpyxl import Workbook
+
+    rnd = random.Random(f"{seed}:{rows}:{date_from}:{date_to}")
+    names = store_names(stores)
+    days = max(0, (date_to - date_from).days)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([
+        None, "Дата", "Id заявки", "Клиент", "Товар", "Цена", "SKU", "Кол-во", "Сумма", "Маркировка",
+        "Магазин", "Регион", "Район", "ИНН", "Период", "Дата первого платежа", "Дата одобрения",
+        "Партнёр", "Накладная", "Тип возврата",
+    ])
+    for i in range(1, rows + 1):
+        sku = 100000 + rnd.randrange(skus)
+        price = float(rnd.randrange(50, 5000) * 1000)
+        sale_date = date_from + timedelta(days=rnd.randint(0, days))
+        canceled = rnd.random() < 0.03
+        ws.append([
+            i,
+            sale_date.strftime("%d.%m.%Y"),
+            rnd.randrange(1_000_000, 9_999_999),
+            f"Клиент {rnd.randrange(100000)}",
+            f"Товар {sku}",
+            price,
+            str(sku),
+            1,
+            price,
+            None,
+            rnd.choice(names),
+            "Ташкент",
+            f"Район {rnd.randrange(12)}",
+            str(rnd.randrange(100_000_000, 999_999_999)),
+            rnd.choice((3, 6, 9, 12)),
+            sale_date.strftime("%d.%m.%Y"),
+            sale_date.strftime("%d.%m.%Y"),
+            "ООО Партнёр",
+            "Минусовая" if canceled else "Основная",
+            "Полный" if canceled else None,
+        ])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def create_app(cfg: SimConfig) -> FastAPI:
+    app = FastAPI(title="alif-simulator")
+    reports: dict[str, _Report] = {}
+    stats: Counter = Counter()
+    rnd = random.Random(cfg.seed)
+
+    @app.middleware("http")
+    async def chaos(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/_sim"):
+            return await call_next(request)
+        stats[f"requests:{path}"] += 1
+        delay = max(0.0, rnd.gauss(cfg.latency_ms, cfg.latency_jitter_ms)) / 1000
+        roll = rnd.random()
+        await asyncio.sleep(delay)
+        if roll < cfg.rate_429:
+            stats["429"] += 1
+            return JSONResponse(
+                {"message": "Too Many Requests"}, status_code=429,
+                headers={"Retry-After": str(cfg.retry_after_sec)},
+            )
+        if roll < cfg.rate_429 + cfg.fail_rate:
+            stats["5xx"] += 1
+            return JSONResponse({"message": "Service Unavailable"}, status_code=503)
+        return await call_next(request)
+
+    # ---------- keycloak ----------
+
+    @app.post("/token")
+    async def token(grant_type: str = Form(...)):
+        stats[f"token:{grant_type}"] += 1
+        return {
+            "access_token": uuid.uuid4().hex,
+            "refresh_token": uuid.uuid4().hex,
+            "expires_in": cfg.token_ttl_sec,
+            "token_type": "Bearer",
+        }
+
+    # ---------- reports ----------
+
+    @app.post(f"{REPORTS_PREFIX}/generate")
+    async def generate(payload: dict):
+        report_id = uuid.uuid4().hex[:16]
+        reports[report_id] = _Report(
+            date_from=date.fromisoformat(payload["datetime_from"][:10]),
+            date_to=date.fromisoformat(payload["datetime_to"][:10]),
+            ready_at=time.monotonic() + cfg.report_ready_sec,
+            failed=rnd.random() < cfg.report_fail_rate,
+        )
+        return {"report_id": report_id}
+
+    @app.get(f"{REPORTS_PREFIX}/check")
+    async def check(report_id: str):
+        rep = reports.get(report_id)
+        if rep is None:
+            return JSONResponse({"message": "not found"}, status_code=404)
+        if time.monotonic() < rep.ready_at:
+            return {"status": "PROCESSING"}
+        return {"status": "FAILED" if rep.failed else "SUCCESS"}
+
+    @app.get(f"{REPORTS_PREFIX}/download")
+    async def download(report_id: str):
+        rep = reports.get(report_id)
+        if rep is None or rep.failed or time.monotonic() < rep.ready_at:
+            return JSONResponse({"message": "not ready"}, status_code=404)
+        body = await run_in_threadpool(
+            build_xlsx, cfg.report_rows, rep.date_from, rep.date_to, cfg.stores, cfg.skus, cfg.seed
+        )
+        stats["download_bytes"] += len(body)
+        return Response(content=body, media_type=XLSX_MEDIA_TYPE)
+
+    # ---------- merchant api ----------
+
+    @app.get("/merchant/merchant/stores")
+    async def stores():
+        return {"data": [{"id": i, "name": n} for i, n in enumerate(store_names(cfg.stores), start=1)]}
+
+    @app.get("/merchant/catalog/v1/offers/by-sku")
+    async def offers_by_sku(skus: str = ""):
+        out = []
+        for sku in filter(None, skus.split(",")):
+            # детерминированно по SKU: один и тот же SKU всегда есть или всегда нет
+            if random.Random(sku).random() < cfg.catalog_miss_rate:
+                continue
+            out.append({"sku": sku, "offer_id": f"offer-{sku}", "item_id": int(sku) if sku.isdigit() else None})
+        return {"data": out}
+
+    @app.get("/_sim/stats")
+    async def sim_stats():
+        return {"reports": len(reports), **stats}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    defaults = SimConfig()
+    parser = argparse.ArgumentParser(description="Локальный симулятор Alif API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    for name, value in vars(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    cfg = SimConfig(**{k: getattr(args, k) for k in vars(defaults)})
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
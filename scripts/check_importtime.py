@@ -0,0 +1,83 @@
+# scripts/check_importtime.py
+# Регрессия холодного старта: python scripts/check_importtime.py [--budget-ms 1500]
+#
+# Для каждой точки входа запускает чистый интерпретатор с `-X importtime` и БЕЗ переменных
+# окружения приложения, и падает (exit 1), если:
+# - импорт требует settings (значит Settings/engine/Fernet снова строятся при импорте)
+# - в дерево импорта попали тяжёлые модули (pandas/openpyxl/numpy)
+# - суммарное время импорта точки входа больше бюджета
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRYPOINTS = ["app.main", "app.worker", "app.cli"]
+FORBIDDEN = ["pandas", "openpyxl", "numpy"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> tuple[int, dict[str, int], str]:
+    env = {k: v for k, v in os.environ.items() if k in ("PATH", "HOME", "PYTHONPATH", "VIRTUAL_ENV")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    cumulative: dict[str, int] = {}
+    other = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            cumulative[m.group(4)] = int(m.group(2))
+        elif not line.startswith("import time:"):
+            other.append(line)
+    return proc.returncode, cumulative, "\n".join(other)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=int, default=1500)
+    args = parser.parse_args()
+
+    failed = False
+    for module in ENTRYPOINTS:
+        code, cumulative, err = measure(module)
+        if code != 0:
+            print(f"FAIL {module}: импорт упал без env (settings при импорте?)\n{err}")
+            failed = True
+            continue
+
+        total_ms = cumulative.get(module, 0) / 1000
+        heavy = [m for m in FORBIDDEN if m in cumulative]
+        top = sorted(
+            ((us, name) for name, us in cumulative.items() if "." not in name and name != module),
+            reverse=True,
+        )[:5]
+
+        status = "ok"
+        if heavy:
+            status = f"FAIL: тяжёлые модули в импорте: {', '.join(heavy)}"
+            failed = True
+        elif total_ms > args.budget_ms:
+            status = f"FAIL: {total_ms:.0f}ms > бюджет {args.budget_ms}ms"
+            failed = True
+
+        print(f"{module}: {total_ms:.0f}ms  {status}")
+        for us, name in top:
+            print(f"    {name:<24} {us / 1000:8.1f}ms")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# scripts/loadtest.py
+# Нагрузочный прогон против запущенного приложения (обычно в паре с scripts/alif_simulator.py):
+#
+#   python scripts/loadtest.py queue  --runs 50 --concurrency 10    # POST /sales/report-runs + ожидание INGESTED
+#   python scripts/loadtest.py sync   --runs 20 --concurrency 4     # POST /sales/report-run (generate..ingest в запросе)
+#   python scripts/loadtest.py ingest --runs 50 --concurrency 8 --rows 20000   # POST /sales/ingest готового xlsx
+#
+# Печатает p50/p95/p99 латентности, пропускную способность (runs/s, строк/s) и ошибки;
+# с --sim-url добавляет счётчики симулятора (сколько было 429/5xx и т.п.).
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from alif_simulator import build_xlsx  # noqa: E402
+
+FINAL_STATUSES = ("INGESTED", "FAILED")
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    rows: int = 0
+    errors: Counter = field(default_factory=Counter)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))  # nearest-rank
+    return ordered[k]
+
+
+def _period(i: int, days: int) -> tuple[date, date]:
+    # разные периоды на каждый прогон, чтобы не мерить один и тот же повторный ingest
+    date_to = date.today() - timedelta(days=i * days)
+    return date_to - timedelta(days=days - 1), date_to
+
+
+async def _wait_ingested(client: httpx.AsyncClient, report_run_id: int, poll_sec: float) -> dict:
+    while True:
+        r = await client.get(f"/sales/report-runs/{report_run_id}")
+        r.raise_for_status()
+        data = r.json()
+        if data["status"] in FINAL_STATUSES:
+            return data
+        await asyncio.sleep(poll_sec)
+
+
+async def one_queue(client: httpx.AsyncClient, i: int, args) -> int:
+    date_from, date_to = _period(i, args.days)
+    r = await client.post(
+        "/sales/report-runs",
+        json={"type_id": args.type_id, "date_from": str(date_from), "date_to": str(date_to)},
+    )
+    r.raise_for_status()
+    data = await _wait_ingested(client, r.json()["report_run_id"], args.poll_sec)
+    if data["status"] != "INGESTED":
+        raise RuntimeError(f"status={data['status']}: {data.get('last_error')}")
+    return int((data.get("progress") or {}).get("total") or 0)
+
+
+async def one_sync(client: httpx.AsyncClient, i: int, args) -> int:
+    date_from, date_to = _period(i, args.days)
+    r = await client.post(
+        "/sales/report-run",
+        json={
+            "type_id": args.type_id,
+            "date_from": str(date_from),
+            "date_to": str(date_to),
+            "poll_sec": max(1, int(args.poll_sec)),
+        },
+    )
+    r.raise_for_status()
+    return int((r.json().get("ingest") or {}).get("raw_in_file") or 0)
+
+
+async def one_ingest(client: httpx.AsyncClient, i: int, args) -> int:
+    date_from, date_to = _period(i, args.days)
+    body = await asyncio.to_thread(build_xlsx, args.rows, date_from, date_to)
+    r = await client.post(
+        "/sales/ingest",
+        files={"file": (f"loadtest-{i}.xlsx", body, "application/octet-stream")},
+    )
+    r.raise_for_status()
+    return int(r.json().get("raw_in_file") or args.rows)
+
+
+SCENARIOS = {"queue": one_queue, "sync": one_sync, "ingest": one_ingest}
+
+
+async def run(args) -> Result:
+    scenario = SCENARIOS[args.scenario]
+    res = Result()
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def worker(client: httpx.AsyncClient, i: int) -> None:
+        async with sem:
+            start = time.perf_counter()
+            try:
+                res.rows += await scenario(client, i, args)
+            except Exception as e:
+                res.errors[type(e).__name__] += 1
+                if args.verbose:
+                    print(f"run {i}: {type(e).__name__}: {e}", file=sys.stderr)
+                return
+            res.latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client, i) for i in range(args.runs)))
+    return res
+
+
+def report(res: Result, elapsed: float, sim_stats: dict | None) -> dict:
+    ok = len(res.latencies)
+    out = {
+        "runs_ok": ok,
+        "runs_failed": sum(res.errors.values()),
+        "errors": dict(res.errors),
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_runs_per_sec": round(ok / elapsed, 3) if elapsed else None,
+        "throughput_rows_per_sec": round(res.rows / elapsed, 1) if elapsed else None,
+        "latency_sec": {
+            "p50": round(percentile(res.latencies, 50), 3),
+            "p95": round(percentile(res.latencies, 95), 3),
+            "p99": round(percentile(res.latencies, 99), 3),
+            "max": round(max(res.latencies), 3) if res.latencies else None,
+        },
+    }
+    if sim_stats is not None:
+        out["simulator"] = sim_stats
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон report runs / ingest")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="адрес приложения")
+    parser.add_argument("--sim-url", default=None, help="адрес alif_simulator (для его счётчиков)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--type-id", type=int, default=12)
+    parser.add_argument("--days", type=int, default=7, help="длина периода одного прогона")
+    parser.add_argument("--rows", type=int, default=5000, help="строк в xlsx (сценарий ingest)")
+    parser.add_argument("--poll-sec", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    res = asyncio.run(run(args))
+    elapsed = time.perf_counter() - start
+
+    sim_stats = None
+    if args.sim_url:
+        sim_stats = httpx.get(f"{args.sim_url}/_sim/stats", timeout=10).json()
+
+    print(json.dumps(report(res, elapsed, sim_stats), ensure_ascii=False, indent=2))
+    return 1 if res.errors and not res.latencies else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())